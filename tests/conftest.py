@@ -1,6 +1,8 @@
 import sys
 import os
 
+import pytest
+
 
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(root_dir)
@@ -32,3 +34,14 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True, scope='session')
+def test_settings():
+    # те же кэш в памяти и метрики без общего каталога, что у
+    # manage.py test (yatube/test_runner.py): они нужны запущенному сайту
+    from django.test.utils import override_settings
+    from yatube.test_runner import TEST_SETTINGS
+
+    with override_settings(**TEST_SETTINGS):
+        yield
@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.contrib import admin
+from django.utils import timezone
 
-from .models import Post, Group, Follow, Comment
+from .models import Post, Group, Follow, Comment, Job
+from .search import search_posts
 
 
 
@@ -26,12 +29,30 @@ class CommentAdmin(admin.ModelAdmin):
     empty_value_display = "-пусто-"
 
 
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("pk", "name", "state", "attempts", "run_at",
+                    "created")
+    list_filter = ("state", "name")
+    actions = ("retry",)
+
+    def retry(self, request, queryset):
+        queryset.filter(state=Job.FAILED).update(
+            state=Job.QUEUED, attempts=0, run_at=timezone.now())
+    retry.short_description = "Повторить упавшие задачи"
+
+
 class PostAdmin(admin.ModelAdmin):
     list_display = ("pk", "text", "pub_date", "author", "group")
     search_fields = ("text",)
     list_filter = ("pub_date",)
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_posts(queryset, search_term,
+                            settings.POSTS_SEARCH_ADMIN_LIMIT), False
+
 
 admin.site.register(Post, PostAdmin)
 
@@ -41,3 +62,4 @@ admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Follow, FollowAdmin)
 admin.site.register(Comment, CommentAdmin)
+admin.site.register(Job, JobAdmin)
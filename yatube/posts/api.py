@@ -0,0 +1,134 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_GET
+
+from . import counters, feed, http_cache
+from .models import Group, Post
+from .paginator import get_page
+
+User = get_user_model()
+
+
+def make_etag(*parts):
+    """Сильный ETag из версий объектов в ответе.
+
+    Post.updated меняется и при правке поста, и при новом комментарии,
+    поэтому пары (id, updated) хватает, чтобы заметить любое изменение.
+    """
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def json_response(request, etag, build):
+    """304 при совпавшем If-None-Match, иначе сериализует ответ."""
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(
+            build(), json_dumps_params={'ensure_ascii': False,
+                                        'separators': (',', ':')})
+    response['ETag'] = etag
+    return response
+
+
+def serialize_post(post):
+    return {
+        'id': post.id,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group else None,
+        'image': post.thumbnail_url if post.thumbnail else None,
+        'comments': post.comments_count,
+    }
+
+
+def serialize_page(page, **extra):
+    return {
+        **extra,
+        'results': [serialize_post(post) for post in page],
+        'next': page.paginator.next_cursor,
+        'previous': page.paginator.previous_cursor,
+    }
+
+
+def feed_response(request, page, **extra):
+    etag = make_etag(
+        request.path, page.paginator.next_cursor,
+        page.paginator.previous_cursor, extra,
+        [(post.id, post.updated) for post in page],
+    )
+    return json_response(request, etag,
+                         lambda: serialize_page(page, **extra))
+
+
+# API листает только курсорами: у нумерованной страницы нет курсоров
+@require_GET
+def index(request):
+    page = get_page(request, Post.objects.for_feed(),
+                    cache_key=feed.INDEX_CACHE_KEY, numbered=False)
+    return feed_response(request, page)
+
+
+@require_GET
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    page = get_page(request, group.posts.for_feed(),
+                    cache_key=feed.group_cache_key(group.id), numbered=False)
+    return feed_response(request, page, group=group.slug)
+
+
+@require_GET
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    stats = counters.get_stats(author)
+    page = get_page(request, author.posts.for_feed(), numbered=False)
+    return feed_response(request, page, author={
+        'username': author.username,
+        'posts': stats.posts_count,
+        'followers': stats.followers_count,
+        'following': stats.following_count,
+    })
+
+
+@require_GET
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'detail': 'Нужна авторизация'}, status=401)
+    # ETag из отметок изменений ленты: на 304 страница не читается
+    markers = http_cache.feed_markers(request.user)
+    etag = make_etag(request.get_full_path(), request.user.pk, markers)
+    http_cache.pin_if_recent(max(markers))
+    response = json_response(request, etag, lambda: serialize_page(
+        feed.get_timeline_page(request, request.user, numbered=False)))
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+@require_GET
+def post_view(request, username, post_id):
+    post = get_object_or_404(Post.objects.for_feed(), id=post_id,
+                             author__username=username)
+    etag = make_etag(request.path, post.id, post.updated)
+
+    def build():
+        comments = (post.comments.select_related('author')
+                    [:settings.API_COMMENTS_LIMIT])
+        return {
+            **serialize_post(post),
+            'comment_list': [{
+                'id': comment.id,
+                'author': comment.author.username,
+                'text': comment.text,
+                'created': comment.created.isoformat(),
+            } for comment in comments],
+        }
+
+    return json_response(request, etag, build)
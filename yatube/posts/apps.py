@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # модули с фоновыми задачами, которых ещё не импортировали сигналы
+        from . import mail, thumbnails  # noqa: F401
@@ -0,0 +1,397 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+import tracemalloc
+from itertools import count
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection, reset_queries
+from django.db.backends.signals import connection_created
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import override_settings
+from django.urls import reverse
+from yatube.asgi import ASGIHandler, scope_to_environ
+
+from .models import Follow, Group, UserStats
+from .seeding import Seeder
+
+User = get_user_model()
+
+# путь к временной базе, которую команда замера создала для воркера
+WORKER_DB_ENV = 'BENCHMARK_WORKER_DB'
+
+
+class Scenario:
+    """Одна замеряемая страница.
+
+    ``url`` получает подготовленные объекты и номер повтора, чтобы
+    запросы на запись каждый раз делали настоящую работу. Ответ с
+    другим кодом, чем ``status``, прерывает замер: ошибка или редирект
+    на вход отвечают быстрее настоящей страницы.
+    """
+
+    def __init__(self, name, url, method='get', data=None, status=200):
+        self.name = name
+        self.url = url
+        self.method = method
+        self.data = data or {}
+        self.status = status
+
+
+SCENARIOS = [
+    Scenario('index', lambda ctx, step: reverse('index')),
+    Scenario('group_posts', lambda ctx, step: reverse(
+        'group_posts', kwargs={'slug': ctx['group'].slug})),
+    Scenario('profile', lambda ctx, step: reverse(
+        'profile', kwargs={'username': ctx['author'].username})),
+    Scenario('post_view', lambda ctx, step: reverse('post', kwargs={
+        'username': ctx['author'].username, 'post_id': ctx['post'].id})),
+    Scenario('follow_index', lambda ctx, step: reverse('follow_index')),
+    Scenario('add_comment', lambda ctx, step: reverse('add_comment', kwargs={
+        'username': ctx['author'].username, 'post_id': ctx['post'].id}),
+        method='post', data={'text': 'Комментарий для замера'}, status=302),
+    Scenario('profile_follow', lambda ctx, step: reverse(
+        'profile_follow',
+        kwargs={'username': ctx['strangers'][step].username}), status=302),
+]
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def prepare(repeat):
+    """Самые нагруженные объекты набора: их страницы и замеряются."""
+    stats = UserStats.objects.order_by('-followers_count').first()
+    author = stats.user
+    reader = (User.objects.filter(follower__author=author)
+              .order_by('-stats__following_count').first() or author)
+    followed = Follow.objects.filter(user=reader).values('author_id')
+    strangers = list(User.objects.exclude(id__in=followed)
+                     .exclude(id=reader.id)[:repeat])
+    return {
+        'author': author,
+        'reader': reader,
+        'group': (Group.objects.annotate(total=Count('posts'))
+                  .order_by('-total').first()),
+        'post': author.posts.order_by('-comments_count').first(),
+        'strangers': strangers,
+    }
+
+
+def measure(client, scenario, ctx, repeat, warmup):
+    steps = count()
+    request = getattr(client, scenario.method)
+
+    def call():
+        response = request(scenario.url(ctx, next(steps)), scenario.data)
+        if response.status_code != scenario.status:
+            raise ValueError(f'{scenario.name}: ответ {response.status_code}'
+                             f', ожидался {scenario.status}')
+        return response
+
+    for _ in range(warmup):
+        call()
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        # журнал запросов обнуляется сигналом request_started,
+        # поэтому каждый запрос считается отдельно
+        reset_queries()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = max(queries, len(captured))
+    # отдельный прогон: tracemalloc сам замедляет запрос
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'queries': queries,
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'peak_kb': round(peak / 1024),
+    }
+
+
+# замер шлёт записи одного пользователя подряд, лимиты частоты
+# превратили бы их в 429
+@override_settings(RATE_LIMITS={})
+def run(sizes, repeat=20, warmup=2, log=None):
+    """Замеряет страницы на наборах данных заданных размеров.
+
+    Каждый размер — число пользователей; база очищается и заполняется
+    заново через Seeder с фиксированным seed, поэтому прогоны
+    воспроизводимы. Возвращает словарь ``{"размер/страница": замер}``.
+    """
+    log = log or (lambda message: None)
+    results = {}
+    for size in sizes:
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+        Seeder(seed=size).run(users=size, groups=max(1, size // 50),
+                              posts=10, comments=3, follows=20)
+        need = warmup + repeat + 1
+        ctx = prepare(need)
+        if not (ctx['post'] and ctx['group'] and len(ctx['strangers'])
+                >= need):
+            raise ValueError(f'Набор из {size} пользователей мал для замера')
+        client = Client()
+        client.force_login(ctx['reader'])
+        for scenario in SCENARIOS:
+            key = f'{size}/{scenario.name}'
+            results[key] = measure(client, scenario, ctx, repeat, warmup)
+            log(f'{key}: {results[key]}')
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Регрессии относительно базовых замеров.
+
+    Число запросов сравнивается точно, время и память — с допуском
+    ``tolerance`` (доля), потому что они зависят от машины.
+    """
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append(
+                f'{key}: запросов {previous["queries"]} → '
+                f'{current["queries"]}')
+        for metric in ('p95_ms', 'peak_kb'):
+            if current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(
+                    f'{key}: {metric} {previous[metric]} → '
+                    f'{current[metric]}')
+    return regressions
+
+
+def load_baseline(path):
+    try:
+        with open(path) as source:
+            return json.load(source)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results):
+    with open(path, 'w') as target:
+        json.dump(results, target, ensure_ascii=False, indent=2,
+                  sort_keys=True)
+
+
+def worker_env(directory, **extra):
+    """Окружение процесса замера со своей базой SQLite в ``directory``."""
+    path = os.path.join(directory, 'bench.sqlite3')
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + path, **extra)
+    env[WORKER_DB_ENV] = path
+    env.pop('DB_POOL_SIZE', None)
+    env.pop('DATABASE_REPLICA_URLS', None)
+    return env
+
+
+def check_worker_database():
+    """Замеры очищают базу, поэтому идут только во временной копии."""
+    path = os.environ.get(WORKER_DB_ENV)
+    name = str(settings.DATABASES['default']['NAME'])
+    if not path or os.path.abspath(name) != path:
+        raise CommandError('Замер запускается только во временной базе '
+                           'из самой команды')
+
+
+@override_settings(RATE_LIMITS={})
+def concurrent_load(seconds=10, readers=4, writers=2):
+    """Параллельная нагрузка: читатели открывают главную, писатели
+    публикуют посты через new_post, каждый в своём процессе, как
+    воркеры gunicorn.
+
+    Возвращает пропускную способность, p95 и число ошибок (например,
+    «database is locked») для чтения и записи.
+    """
+    call_command('flush', interactive=False, verbosity=0)
+    cache.clear()
+    Seeder(seed=1).run(users=200, groups=4, posts=10, comments=3,
+                       follows=20)
+    author = UserStats.objects.order_by('-followers_count').first().user
+    # соединение не должно достаться дочерним процессам
+    connection.close()
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    stop = time.time() + seconds
+    workers = [context.Process(target=load_worker,
+                               args=(kind, author, stop, queue))
+               for kind in ['read'] * readers + ['write'] * writers]
+    for worker in workers:
+        worker.start()
+    results = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+    for _ in workers:
+        kind, timings, failed = queue.get()
+        results[kind] += timings
+        errors[kind] += failed
+    for worker in workers:
+        worker.join()
+    return {kind: load_summary(timings, errors[kind], seconds)
+            for kind, timings in results.items()}
+
+
+def load_worker(kind, author, stop, queue):
+    client = Client()
+    if kind == 'write':
+        client.force_login(author)
+    timings = []
+    failed = 0
+    try:
+        while time.time() < stop:
+            started = time.perf_counter()
+            try:
+                if kind == 'write':
+                    response = client.post(reverse('new_post'),
+                                           {'text': 'Пост под нагрузкой'})
+                    ok = response.status_code == 302
+                else:
+                    ok = client.get(reverse('index')).status_code == 200
+            except DatabaseError:
+                ok = False
+            if ok:
+                timings.append((time.perf_counter() - started) * 1000)
+            else:
+                failed += 1
+    finally:
+        connection.close()
+        queue.put((kind, timings, failed))
+
+
+def asgi_load(clients=32, requests=640, db_latency_ms=2.0):
+    """Сколько запросов держит один процесс на WSGI и на ASGI.
+
+    ``clients`` клиентов по кругу открывают главную, группу, профиль
+    и пост. WSGI-воркер, как синхронный воркер gunicorn, обслуживает
+    их по одному; ASGI — пулом из ASGI_THREADS потоков, с
+    одновременными запросами внутри представлений и без них.
+    SQLite отвечает без сетевой задержки, поэтому каждый SQL-запрос
+    ждёт ещё ``db_latency_ms``, как до отдельного сервера базы.
+    """
+    call_command('flush', interactive=False, verbosity=0)
+    cache.clear()
+    Seeder(seed=1).run(users=200, groups=4, posts=10, comments=3,
+                       follows=20)
+    ctx = prepare(1)
+    paths = [reverse('index'),
+             reverse('group_posts', kwargs={'slug': ctx['group'].slug}),
+             reverse('profile', kwargs={'username': ctx['author'].username}),
+             reverse('post', kwargs={'username': ctx['author'].username,
+                                     'post_id': ctx['post'].id})]
+    paths = [paths[number % len(paths)] for number in range(requests)]
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(db_latency_ms / 1000)
+        return execute(sql, params, many, context)
+
+    def add_delay(sender, connection, **kwargs):
+        connection.execute_wrappers.append(delay)
+
+    # задержка действует на соединения, открытые после этой строки
+    connection.close()
+    connection_created.connect(add_delay)
+    handler = ASGIHandler()
+    try:
+        results = {'wsgi': serve_wsgi(handler.wsgi, paths, clients)}
+        with override_settings(VIEW_QUERY_THREADS=1):
+            results['asgi'] = asyncio.run(serve_asgi(handler, paths,
+                                                     clients))
+        results['asgi+gather'] = asyncio.run(serve_asgi(handler, paths,
+                                                        clients))
+    finally:
+        connection_created.disconnect(add_delay)
+        handler.executor.shutdown()
+    return results
+
+
+def http_scope(path):
+    return {'type': 'http', 'method': 'GET', 'path': path,
+            'query_string': b'', 'headers': [(b'host', b'testserver')]}
+
+
+def load_summary(timings, errors, seconds):
+    return {
+        'per_second': round(len(timings) / seconds, 1),
+        'p95_ms': round(percentile(timings, 0.95), 2) if timings else None,
+        'errors': errors,
+    }
+
+
+def serve_wsgi(application, paths, clients):
+    worker = threading.Lock()
+    timings = []
+    errors = []
+
+    def client(chunk):
+        for path in chunk:
+            started = time.perf_counter()
+            # клиенты ждут в очереди, пока воркер занят
+            with worker:
+                status = []
+                response = application(
+                    scope_to_environ(http_scope(path), b''),
+                    lambda code, headers: status.append(code))
+                try:
+                    b''.join(response)
+                finally:
+                    response.close()
+            if status[0].startswith('200'):
+                timings.append((time.perf_counter() - started) * 1000)
+            else:
+                errors.append(path)
+
+    threads = [threading.Thread(target=client, args=(paths[number::clients],))
+               for number in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return load_summary(timings, len(errors),
+                        time.perf_counter() - started)
+
+
+async def serve_asgi(application, paths, clients):
+    timings = []
+    errors = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def client(chunk):
+        for path in chunk:
+            started = time.perf_counter()
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            await application(http_scope(path), receive, send)
+            if messages[0]['status'] == 200:
+                timings.append((time.perf_counter() - started) * 1000)
+            else:
+                errors.append(path)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(paths[number::clients])
+                           for number in range(clients)))
+    return load_summary(timings, len(errors),
+                        time.perf_counter() - started)
@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from yatube.db import bulk_batch_size
+
+from . import jobs
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+def get_stats(user):
+    # get_or_create читает с primary, а строка почти всегда уже есть
+    stats = UserStats.objects.filter(user_id=user.pk).first()
+    if stats is None:
+        stats, _ = UserStats.objects.get_or_create(user_id=user.pk)
+    return stats
+
+
+def bump_stats(user_id, **deltas):
+    """Атомарно сдвигает счётчики пользователя: bump_stats(1, posts_count=1).
+
+    Уменьшение строку не создаёт: пользователь может удаляться каскадно.
+    """
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    if UserStats.objects.filter(user_id=user_id).update(**changes):
+        return
+    if all(delta > 0 for delta in deltas.values()):
+        UserStats.objects.get_or_create(user_id=user_id)
+        UserStats.objects.filter(user_id=user_id).update(**changes)
+
+
+def bump_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta, updated=timezone.now())
+
+
+def _count(model, field):
+    rows = (model.objects.filter(**{field: OuterRef('pk')})
+            .order_by().values(field)
+            .annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def _recount(users):
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk)
+         for pk in users.values_list('pk', flat=True).iterator()),
+        batch_size=bulk_batch_size(UserStats, 1000),
+        ignore_conflicts=True,
+    )
+    UserStats.objects.filter(user__in=users).update(
+        posts_count=_count(Post, 'author'),
+        followers_count=_count(Follow, 'author'),
+        following_count=_count(Follow, 'user'),
+    )
+    Post.objects.filter(author__in=users).update(
+        comments_count=_count(Comment, 'post'))
+
+
+def recount_all():
+    """Пересчитывает все счётчики по исходным таблицам."""
+    _recount(User.objects.all())
+
+
+@jobs.task(batch_size=500)
+def recount_users(payloads):
+    """Пересчитывает счётчики пачки пользователей: в фоне это короткие
+    транзакции вместо одной на всю базу."""
+    _recount(User.objects.filter(
+        pk__in=[kwargs['user_id'] for kwargs in payloads]))
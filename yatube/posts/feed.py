@@ -0,0 +1,195 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+from yatube.db import bulk_batch_size
+
+from . import counters, http_cache, jobs
+from .models import FeedEntry, Follow, Post, UserStats
+from .paginator import NEXT, CursorPaginator, get_page
+
+INDEX_CACHE_KEY = 'feed:index'
+
+
+def group_cache_key(group_id):
+    return f'feed:group:{group_id}'
+
+
+def expire_cached_pages(post):
+    """Сбрасывает закэшированный состав первых страниц с этим постом.
+
+    У перенесённого поста сбрасывается и группа, из которой он ушёл.
+    """
+    group_ids = {post.group_id, getattr(post, 'saved_group_id', None)}
+    cache.delete_many([INDEX_CACHE_KEY] + [group_cache_key(group_id)
+                                           for group_id in group_ids
+                                           if group_id])
+
+
+def is_celebrity(author_id):
+    """Посты таких авторов не раскладываются по лентам, а читаются на лету."""
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gte=settings.FEED_FANOUT_LIMIT).exists()
+
+
+def celebrity_ids(user):
+    return Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gte=settings.FEED_FANOUT_LIMIT,
+    ).values('author_id')
+
+
+@jobs.task()
+def fan_out(post_id):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=bulk_batch_size(FeedEntry,
+                                   settings.FEED_BATCH_SIZE),
+        ignore_conflicts=True,
+    )
+    http_cache.touch('follow')
+    # пока обрезка ждёт в очереди, новые посты автора её не дублируют
+    trim_followers.delay(author_id=post.author_id)
+
+
+@jobs.task(unique=True)
+def trim_followers(author_id):
+    """Обрезает ленты подписчиков автора после раскладки его постов."""
+    followers = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    for user_id in followers.iterator():
+        trim(user_id)
+    http_cache.touch('follow')
+
+
+@jobs.task()
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    # подписку могли отменить, пока задача ждала в очереди
+    if is_celebrity(author_id) or not Follow.objects.filter(
+            user_id=user_id, author_id=author_id).exists():
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by('-pub_date',
+                                                              '-id')
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts.values_list(
+             'id', 'pub_date')[:settings.FEED_MAX_LENGTH]),
+        batch_size=bulk_batch_size(FeedEntry,
+                                   settings.FEED_BATCH_SIZE),
+        ignore_conflicts=True,
+    )
+    trim(user_id)
+    http_cache.touch(f'follow:{user_id}')
+
+
+@jobs.task(unique=True)
+def backfill_followers(author_id):
+    """Раскладывает по лентам подписчиков посты автора, который перестал
+    быть знаменитостью: пока он ею был, его посты читались на лету."""
+    if is_celebrity(author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    for user_id in followers.iterator():
+        backfill(user_id=user_id, author_id=author_id)
+
+
+def unfollowed(author_id):
+    """Снимает подписчика со счётчика автора; автор, опустившийся ниже
+    FEED_FANOUT_LIMIT, снова получает раскладку постов."""
+    with transaction.atomic():
+        counters.bump_stats(author_id, followers_count=-1)
+        # строка счётчика заблокирована до конца транзакции, поэтому
+        # переход через порог видит ровно одна отписка
+        followers = (UserStats.objects.using(DEFAULT_DB_ALIAS)
+                     .filter(user_id=author_id)
+                     .values_list('followers_count', flat=True).first())
+        if followers == settings.FEED_FANOUT_LIMIT - 1:
+            backfill_followers.delay(author_id=author_id)
+
+
+def rebuild(user):
+    """Собирает ленту заново по текущим подпискам, например после
+    массовой загрузки данных мимо сигналов."""
+    authors = Follow.objects.filter(user=user).exclude(
+        author_id__in=celebrity_ids(user)).values('author_id')
+    posts = (Post.objects.filter(author_id__in=authors)
+             .order_by('-pub_date', '-id'))
+    FeedEntry.objects.filter(user=user).delete()
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user=user, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts.values_list(
+             'id', 'pub_date')[:settings.FEED_MAX_LENGTH]),
+        batch_size=bulk_batch_size(FeedEntry,
+                                   settings.FEED_BATCH_SIZE),
+    )
+    http_cache.touch(f'follow:{user.pk}')
+
+
+def drop(user, author):
+    FeedEntry.objects.filter(user=user, post__author=author).delete()
+    http_cache.touch(f'follow:{user.pk}')
+
+
+def trim(user):
+    """Оставляет в ленте не больше FEED_MAX_LENGTH свежих записей."""
+    stale = (FeedEntry.objects.filter(user=user)
+             .order_by('-pub_date', '-post_id')
+             .values('id')[settings.FEED_MAX_LENGTH:])
+    FeedEntry.objects.filter(id__in=stale).delete()
+
+
+def timeline(user):
+    """Лента подписок: материализованные записи плюс посты знаменитостей.
+
+    Для нумерованных страниц; курсорные читает TimelinePaginator.
+    """
+    entries = FeedEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(id__in=entries) | Q(author_id__in=celebrity_ids(user)))
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорная лента подписок.
+
+    Ключи страницы берутся из индекса (user, -pub_date, -post)
+    материализованной ленты, к ним примешиваются посты знаменитостей,
+    а сами посты читаются по первичному ключу.
+    """
+
+    def __init__(self, user, per_page):
+        super().__init__(Post.objects.for_feed(), per_page)
+        self.user = user
+
+    def fetch(self, direction, values):
+        limit = self.per_page + 1
+        entries = self.ordered(FeedEntry.objects.filter(user=self.user),
+                               direction, values, ('pub_date', 'post_id'))
+        keys = list(entries.values_list('pub_date', 'post_id')[:limit])
+        authors = list(celebrity_ids(self.user).values_list('author_id',
+                                                            flat=True))
+        if authors:
+            posts = self.ordered(Post.objects.filter(author_id__in=authors),
+                                 direction, values)
+            keys += posts.values_list('pub_date', 'id')[:limit]
+        # пост мог попасть в ленту до того, как автор стал знаменитостью
+        keys = sorted(set(keys), reverse=direction == NEXT)[:limit]
+        rows = self.object_list.in_bulk([pk for _, pk in keys])
+        return [rows[pk] for _, pk in keys if pk in rows]
+
+
+def get_timeline_page(request, user, numbered=True):
+    """Страница ленты подписок: курсорная или нумерованная по ?page=."""
+    if numbered and 'page' in request.GET:
+        return get_page(request, timeline(user).for_feed())
+    paginator = TimelinePaginator(user, settings.POSTS_PER_PAGE)
+    return paginator.get_page(request.GET.get('cursor'))
@@ -1,5 +1,10 @@
 from posts.models import Post, Comment
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
+
+from .uploads import normalize_image
 
 
 class PostForm(forms.ModelForm):
@@ -9,6 +14,18 @@ class PostForm(forms.ModelForm):
         labels = {'group': 'Группа', 'text': 'Текст', 'image': 'Изображение'}
         help_texts = {'group': 'Выбрать группу', 'text': 'Написать текст'}
 
+    def __init__(self, *args, upload_too_large=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        # upload_too_large — загрузку оборвал обработчик; слишком большой
+        # файл от других обработчиков не отдаём в ImageField, иначе вместо
+        # ошибки размера будет «неправильное изображение»
+        image = self.files.get('image')
+        self.oversized_image = upload_too_large or (
+            bool(image) and image.size > settings.IMAGE_UPLOAD_MAX_SIZE)
+        if self.oversized_image:
+            self.files = {key: value for key, value in self.files.items()
+                          if key != 'image'}
+
     def clean_text(self):
         data = self.cleaned_data['text']
 
@@ -17,6 +34,25 @@ class PostForm(forms.ModelForm):
 
         return data
 
+    def clean_image(self):
+        if self.oversized_image:
+            raise forms.ValidationError(
+                'Файл слишком большой, максимум %s'
+                % filesizeformat(settings.IMAGE_UPLOAD_MAX_SIZE))
+        image = self.cleaned_data['image']
+        if image and 'image' in self.changed_data:
+            return normalize_image(image)
+        return image
+
+    def save(self, commit=True):
+        post = super().save(commit)
+        image = self.cleaned_data.get('image')
+        if commit and isinstance(image, UploadedFile):
+            # хранилище уже перенесло временный файл, и без close() его
+            # удаление при сборке мусора падает с FileNotFoundError
+            image.close()
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,128 @@
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date
+from yatube import replicas
+
+from .models import Group
+
+User = get_user_model()
+
+
+def marker_key(scope):
+    return f'lastmod:{scope}'
+
+
+def touch(*scopes):
+    """Отмечает, что страницы этих областей изменились прямо сейчас."""
+    now = timezone.now()
+    cache.set_many({marker_key(scope): now for scope in scopes if scope},
+                   timeout=None)
+
+
+def touch_post(author_id, *group_ids):
+    """Пост виден на главной, в своей группе и в профиле автора.
+
+    Для перенесённого поста передаются и старая, и новая группа.
+    """
+    touch('index', f'profile:{author_id}',
+          *(f'group:{group_id}' for group_id in group_ids if group_id))
+
+
+def last_modified(scope):
+    """Время последнего изменения области.
+
+    Это отметка из кэша, которую ставят сигналы. Кэш может вытеснить
+    её раньше срока, а по постам не восстановить удаления и подписки,
+    поэтому пропавшая отметка ставится заново текущим временем:
+    Last-Modified не уходит назад, и старый ответ не получит 304.
+    """
+    key = marker_key(scope)
+    modified = cache.get(key)
+    if modified is None:
+        now = timezone.now()
+        cache.add(key, now, timeout=None)
+        # отметку мог одновременно поставить другой запрос
+        modified = cache.get(key) or now
+    return modified
+
+
+def feed_markers(user):
+    """Отметки, от которых зависит лента подписок пользователя.
+
+    'index' сдвигает любое изменение постов, 'follow' — раскладка постов
+    по лентам, 'follow:<id>' — подписки и отписки пользователя. Пропавшая
+    из кэша отметка ставится заново текущим временем.
+    """
+    keys = [marker_key(scope)
+            for scope in ('index', 'follow', f'follow:{user.pk}')]
+    markers = cache.get_many(keys)
+    missing = {key: timezone.now() for key in keys if key not in markers}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        markers.update(missing)
+    return [markers[key] for key in keys]
+
+
+def pin_if_recent(modified):
+    # реплики могут ещё не догнать отмеченное изменение, а кэш хранил бы
+    # старый ответ под новым валидатором
+    if modified and time.time() - modified.timestamp() < (
+            settings.REPLICA_STICKY_SECONDS):
+        replicas.pin()
+
+
+def index_scope(request):
+    return 'index'
+
+
+def group_scope(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return f'group:{group.id}'
+
+
+def profile_scope(request, username):
+    author = get_object_or_404(User, username=username)
+    return f'profile:{author.id}'
+
+
+def cache_policy(scope_func):
+    """Заголовки кэширования для HTML-страницы.
+
+    Анонимам отдаётся публичный ответ с Last-Modified, который может
+    хранить CDN, а на If-Modified-Since отвечаем 304 без рендеринга
+    шаблона. Страницы авторизованных зависят от пользователя, поэтому
+    они приватные и всегда перепроверяются.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True, no_cache=True)
+                patch_vary_headers(response, ('Cookie',))
+                return response
+            modified = last_modified(scope_func(request, *args, **kwargs))
+            timestamp = int(modified.timestamp()) if modified else None
+            pin_if_recent(modified)
+            response = get_conditional_response(request,
+                                                last_modified=timestamp)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if timestamp and response.status_code == 200:
+                    response['Last-Modified'] = http_date(timestamp)
+            if response.status_code in (200, 304):
+                patch_cache_control(response, public=True,
+                                    max_age=settings.HTML_CACHE_MAX_AGE)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,265 @@
+import datetime as dt
+import json
+import logging
+import os
+import socket
+import time
+import traceback
+import uuid
+from functools import update_wrapper
+
+from django.conf import settings
+from django.db import (IntegrityError, OperationalError,
+                       close_old_connections, connection, transaction)
+from django.db.models import F, Min, Q
+from django.utils import timezone
+from yatube import caching
+
+from .models import Job, JobLock
+
+logger = logging.getLogger('yatube.jobs')
+
+registry = {}
+
+
+class Task:
+    """Функция, которую можно выполнить в фоне: ``task.delay(**kwargs)``.
+
+    Прямой вызов выполняет её сразу, как обычную функцию.
+    """
+
+    def __init__(self, func, batch_size, concurrency, max_attempts, unique):
+        update_wrapper(self, func)
+        self.func = func
+        self.name = f'{func.__module__}.{func.__name__}'
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts or settings.JOBS_MAX_ATTEMPTS
+        self.unique = unique
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def run(self, payloads):
+        if self.batch_size > 1:
+            self.func(payloads)
+        else:
+            for kwargs in payloads:
+                self.func(**kwargs)
+
+    def delay(self, **kwargs):
+        """Ставит задачу в очередь в текущей транзакции: она попадёт
+        к воркеру, только если транзакция зафиксируется."""
+        if is_eager():
+            self.run([kwargs])
+            return
+        payload = json.dumps(kwargs, sort_keys=True)
+        if not self.unique:
+            Job.objects.create(name=self.name, payload=payload)
+            return
+        # второй такой же задачи в очереди не даёт unique_queued_job
+        Job.objects.bulk_create(
+            [Job(name=self.name, payload=payload, key=payload)],
+            ignore_conflicts=True)
+
+    def delay_many(self, payloads):
+        """Ставит в очередь много задач сразу, без проверки уникальности."""
+        if is_eager():
+            self.run(list(payloads))
+            return
+        Job.objects.bulk_create(
+            Job(name=self.name, payload=json.dumps(kwargs, sort_keys=True))
+            for kwargs in payloads)
+
+
+def task(batch_size=1, concurrency=None, max_attempts=None, unique=False):
+    """Регистрирует фоновую задачу.
+
+    ``batch_size`` больше 1 — функция получает список kwargs до этой
+    длины. ``concurrency`` — сколько воркеров одновременно выполняют
+    задачу. ``unique`` — пока задача с теми же аргументами ждёт в
+    очереди, вторая не ставится.
+    """
+    def register(func):
+        registered = Task(func, batch_size, concurrency, max_attempts,
+                          unique)
+        registry[registered.name] = registered
+        return registered
+    return register
+
+
+def is_eager():
+    if settings.JOBS_EAGER is not None:
+        return settings.JOBS_EAGER
+    # in-memory база тестов не видна процессу воркера
+    return connection.vendor == 'sqlite' and connection.is_in_memory_db()
+
+
+def retry_delay(attempts):
+    return min(settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1),
+               settings.JOBS_MAX_RETRY_DELAY)
+
+
+class Worker:
+    """Забирает задачи из очереди и выполняет их.
+
+    Задача забирается условным UPDATE, поэтому воркеров можно запускать
+    сколько угодно; задачи с ``concurrency`` забираются под блокировкой
+    своей строки JobLock, а на SQLite — под блокировкой в общем кэше.
+    Пачка выполняется в одной транзакции с удалением своих строк из
+    очереди: её изменения и отметка о выполнении фиксируются вместе.
+    Задачи воркера, который упал посреди пачки,
+    возвращаются в очередь через JOBS_TIMEOUT.
+    """
+
+    def __init__(self, names=None, log=None):
+        self.names = names
+        self.log = log or (lambda message: None)
+        self.prefix = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def due(self, now):
+        jobs = Job.objects.filter(
+            Q(state=Job.QUEUED, run_at__lte=now)
+            | Q(state=Job.RUNNING, locked_until__lt=now))
+        if self.names:
+            jobs = jobs.filter(name__in=self.names)
+        return jobs
+
+    def claim(self):
+        """Пачка задач одного типа: (Task, [Job]) или None."""
+        now = timezone.now()
+        due = self.due(now)
+        names = (due.values('name').annotate(oldest=Min('run_at'))
+                 .order_by('oldest').values_list('name', flat=True))
+        for name in names:
+            task = registry.get(name)
+            if task is None:
+                due.filter(name=name).update(
+                    state=Job.FAILED, error='Задача не зарегистрирована')
+                continue
+            if task.concurrency:
+                claimed = self.claim_limited(task, due, now)
+            else:
+                claimed = self.claim_batch(task, due, now)
+            if claimed:
+                return task, claimed
+        return None
+
+    def claim_batch(self, task, due, now):
+        ids = list(due.filter(name=task.name).order_by('run_at', 'id')
+                   .values_list('id', flat=True)[:task.batch_size])
+        token = f'{self.prefix}:{uuid.uuid4().hex[:8]}'
+        # строки, которые успел забрать другой воркер, не обновятся
+        claimed = self.due(now).filter(id__in=ids).update(
+            state=Job.RUNNING, locked_by=token,
+            attempts=F('attempts') + 1,
+            locked_until=now + dt.timedelta(seconds=settings.JOBS_TIMEOUT))
+        if not claimed:
+            return []
+        return list(Job.objects.filter(locked_by=token).order_by('id'))
+
+    def claim_limited(self, task, due, now):
+        # подсчёт и UPDATE под блокировкой строки задачи: иначе два
+        # воркера увидят свободное место и оба заберут по пачке
+        if connection.vendor == 'sqlite':
+            return self.claim_limited_sqlite(task, due, now)
+        JobLock.objects.get_or_create(name=task.name)
+        with transaction.atomic():
+            JobLock.objects.select_for_update().get(name=task.name)
+            if self.running(task.name, now) >= task.concurrency:
+                return []
+            return self.claim_batch(task, due, now)
+
+    def claim_limited_sqlite(self, task, due, now):
+        # SQLite не знает SELECT FOR UPDATE, а отложенная транзакция
+        # второго воркера получает «database is locked» при записи,
+        # поэтому задачу забирает тот, кто взял блокировку в общем кэше
+        key = f'jobs:claim:{task.name}'
+        if not caching.lock(key, settings.JOBS_CLAIM_LOCK_TIMEOUT):
+            return []
+        try:
+            if self.running(task.name, now) >= task.concurrency:
+                return []
+            return self.claim_batch(task, due, now)
+        finally:
+            caching.unlock(key)
+
+    def running(self, name, now):
+        # пачку выполняет один воркер, её задачи делят один locked_by
+        return (Job.objects.filter(name=name, state=Job.RUNNING,
+                                   locked_until__gte=now)
+                .values('locked_by').distinct().count())
+
+    def execute(self, task, jobs):
+        with transaction.atomic():
+            task.run([job.kwargs for job in jobs])
+            Job.objects.filter(id__in=[job.id for job in jobs],
+                               locked_by=jobs[0].locked_by).delete()
+
+    def process(self, task, jobs):
+        if len(jobs) > 1:
+            try:
+                self.execute(task, jobs)
+                return
+            except Exception:
+                # по одной, чтобы одна плохая задача не держала пачку
+                logger.warning('batch of %s failed, retrying one by one',
+                               task.name, exc_info=True)
+        for job in jobs:
+            try:
+                self.execute(task, [job])
+            except Exception:
+                self.fail(task, job, traceback.format_exc())
+
+    def fail(self, task, job, error):
+        # попытка засчитана, когда задачу забрали: так считаются
+        # и падения самого воркера
+        attempts = job.attempts
+        changes = {'locked_by': '', 'locked_until': None, 'error': error}
+        if attempts >= task.max_attempts:
+            changes['state'] = Job.FAILED
+            logger.error('job %s failed after %s attempts:\n%s',
+                         job, attempts, error)
+        else:
+            changes['state'] = Job.QUEUED
+            changes['run_at'] = timezone.now() + dt.timedelta(
+                seconds=retry_delay(attempts))
+            logger.warning('job %s failed, attempt %s:\n%s',
+                           job, attempts, error)
+        mine = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+        try:
+            with transaction.atomic():
+                mine.update(**changes)
+        except IntegrityError:
+            # такая же задача уже снова в очереди, повтор сделает она
+            mine.delete()
+
+    def run(self, once=False):
+        """Выполняет задачи, пока не остановят; ``once`` — пока есть
+        готовые к выполнению."""
+        processed = 0
+        while not self.stopping:
+            close_old_connections()
+            try:
+                claimed = self.claim()
+                if claimed:
+                    task, jobs = claimed
+                    self.process(task, jobs)
+                    processed += len(jobs)
+                    self.log(f'{task.name}: {len(jobs)}')
+            except OperationalError:
+                # например, «database is locked» на SQLite, пока пишет
+                # другой воркер; забранные задачи вернёт JOBS_TIMEOUT
+                logger.warning('job queue unavailable, backing off',
+                               exc_info=True)
+                time.sleep(settings.JOBS_POLL_INTERVAL)
+                continue
+            if not claimed:
+                if once:
+                    break
+                time.sleep(settings.JOBS_POLL_INTERVAL)
+        return processed
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from . import jobs
+
+FIELDS = ('subject', 'body', 'from_email', 'to', 'cc', 'bcc', 'reply_to',
+          'extra_headers')
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Письма отправляет воркер очереди задач через JOBS_EMAIL_BACKEND,
+    а запрос (например, сброс пароля) не ждёт почтовый сервер."""
+
+    def send_messages(self, email_messages):
+        queued = [message for message in email_messages
+                  if not message.attachments]
+        send_emails.delay_many(
+            dict({field: getattr(message, field) for field in FIELDS},
+                 alternatives=getattr(message, 'alternatives', []))
+            for message in queued)
+        # вложения в JSON очереди не помещаются, такие письма уходят сразу
+        attached = [message for message in email_messages
+                    if message.attachments]
+        if attached:
+            get_connection(settings.JOBS_EMAIL_BACKEND).send_messages(
+                attached)
+        return len(email_messages)
+
+
+@jobs.task(batch_size=50)
+def send_emails(payloads):
+    """Отправляет пачку писем через одно соединение с почтовым сервером."""
+    messages = []
+    for kwargs in payloads:
+        headers = kwargs.pop('extra_headers')
+        messages.append(EmailMultiAlternatives(headers=headers, **kwargs))
+    get_connection(settings.JOBS_EMAIL_BACKEND).send_messages(messages)
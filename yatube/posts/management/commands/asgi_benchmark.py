@@ -0,0 +1,62 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings, setup_test_environment
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает, сколько запросов к лентам держит один процесс '
+            'на WSGI и на ASGI')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=640)
+        parser.add_argument('--db-latency-ms', type=float, default=2.0,
+                            help='задержка каждого SQL-запроса, как до '
+                                 'сервера базы по сети')
+        # прогон во временной базе, ставится только самой командой
+        parser.add_argument('--worker', action='store_true',
+                            help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        load = {key: options[key]
+                for key in ('clients', 'requests', 'db_latency_ms')}
+        if options['worker']:
+            self.stdout.write(json.dumps(self.run_worker(load)))
+            return
+        for mode, row in self.spawn(load).items():
+            self.stdout.write(f'{mode}: {row}')
+
+    def run_worker(self, load):
+        benchmark.check_worker_database()
+        setup_test_environment()
+        call_command('migrate', verbosity=0)
+        # свой кэш, чтобы замер не зависел от общего
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.'
+                           'LocMemCache'}}):
+            caches['default'].clear()
+            return benchmark.asgi_load(**load)
+
+    def spawn(self, load):
+        # файловая база в WAL: потоки читают её одновременно
+        with tempfile.TemporaryDirectory() as directory:
+            env = benchmark.worker_env(directory, SQLITE_TUNING='1')
+            args = [sys.executable,
+                    os.path.join(settings.BASE_DIR, 'manage.py'),
+                    'asgi_benchmark', '--worker']
+            for key, value in load.items():
+                args += [f'--{key.replace("_", "-")}', str(value)]
+            output = subprocess.run(args, env=env, check=True,
+                                    stdout=subprocess.PIPE).stdout
+        return json.loads(output.decode().splitlines()[-1])
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время, число запросов и память страниц постов '
+            'на наборах данных разного размера во временной базе '
+            'и сравнивает с сохранёнными замерами')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='200,1000',
+                            help='размеры наборов: числа пользователей')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--baseline', default=settings.BENCHMARK_BASELINE)
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='допустимый рост времени и памяти, доля')
+        parser.add_argument('--save-baseline', action='store_true')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # отдельный кэш, чтобы не сбрасывать общий
+            with override_settings(CACHES={'default': {
+                    'BACKEND': 'django.core.cache.backends.locmem.'
+                               'LocMemCache'}}):
+                results = benchmark.run(sizes, repeat=options['repeat'],
+                                        log=self.stdout.write)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['save_baseline']:
+            benchmark.save_baseline(options['baseline'], results)
+            self.stdout.write(f'Замеры сохранены в {options["baseline"]}')
+            return
+        regressions = benchmark.compare(
+            results, benchmark.load_baseline(options['baseline']),
+            options['tolerance'])
+        if regressions:
+            raise CommandError('Регрессии:\n' + '\n'.join(regressions))
+        self.stdout.write('Регрессий нет')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Считает недостающие миниатюры карточек постов'
+
+    def handle(self, *args, **options):
+        posts = (Post.objects.filter(thumbnail='').exclude(image='')
+                 .exclude(image=None).values_list('pk', flat=True))
+        made = 0
+        for post_id in posts.iterator():
+            thumbnails.make_thumbnail(post_id)
+            made += 1
+        self.stdout.write(f'Миниатюр посчитано: {made}')
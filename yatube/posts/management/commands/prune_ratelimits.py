@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from yatube import ratelimit
+
+
+class Command(BaseCommand):
+    help = 'Удаляет полные корзины ограничений частоты из файлового кэша'
+
+    def handle(self, *args, **options):
+        removed = ratelimit.prune()
+        self.stdout.write(f'Удалено корзин: {removed}')
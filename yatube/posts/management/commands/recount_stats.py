@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='store_true',
+                            help='пересчитать в фоне, пачками '
+                                 'пользователей через run_jobs')
+
+    def handle(self, *args, **options):
+        if options['queue']:
+            users = User.objects.values_list('pk', flat=True)
+            counters.recount_users.delay_many(
+                {'user_id': pk} for pk in users.iterator())
+            self.stdout.write('Пересчёт поставлен в очередь')
+            return
+        counters.recount_all()
+        self.stdout.write('Счётчики пересчитаны')
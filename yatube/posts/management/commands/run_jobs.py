@@ -0,0 +1,26 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from posts import jobs
+
+
+class Command(BaseCommand):
+    help = ('Выполняет фоновые задачи из очереди; воркеров можно '
+            'запускать несколько')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='выйти, когда готовые задачи кончатся')
+        parser.add_argument('--task', action='append', dest='tasks',
+                            help='выполнять только эту задачу, '
+                                 'можно указать несколько раз')
+
+    def handle(self, *args, **options):
+        log = self.stdout.write if options['verbosity'] > 1 else None
+        worker = jobs.Worker(names=options['tasks'], log=log)
+        # текущая пачка дорабатывает до конца
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        processed = worker.run(once=options['once'])
+        self.stdout.write(f'Обработано задач: {processed}')
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from posts.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу пользователями, группами, постами, '
+            'комментариями и подписками для нагрузочных замеров')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=20,
+                            help='постов на пользователя в среднем')
+        parser.add_argument('--comments', type=int, default=5,
+                            help='комментариев на пост в среднем')
+        parser.add_argument('--follows', type=int, default=50,
+                            help='подписок на пользователя в среднем')
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--skip-feeds', action='store_true')
+        parser.add_argument('--skip-search', action='store_true')
+
+    def handle(self, *args, **options):
+        seeder = Seeder(batch_size=options['batch_size'],
+                        seed=options['seed'], days=options['days'],
+                        log=self.stdout.write)
+        seeder.run(users=options['users'], groups=options['groups'],
+                   posts=options['posts'], comments=options['comments'],
+                   follows=options['follows'],
+                   rebuild_feeds=not options['skip_feeds'],
+                   reindex=not options['skip_search'])
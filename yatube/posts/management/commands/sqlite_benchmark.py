@@ -0,0 +1,63 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings, setup_test_environment
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность главной и new_post '
+            'на SQLite в обычном режиме и с SQLITE_TUNING=1')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=int, default=10)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        # прогон во временной базе, ставится только самой командой
+        parser.add_argument('--worker', action='store_true',
+                            help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        load = {key: options[key]
+                for key in ('seconds', 'readers', 'writers')}
+        if options['worker']:
+            self.stdout.write(json.dumps(self.run_worker(load)))
+            return
+        for tuning in ('0', '1'):
+            result = self.spawn(tuning, load)
+            self.stdout.write(f'SQLITE_TUNING={tuning}: '
+                              + ', '.join(f'{kind} {row}'
+                                          for kind, row in result.items()))
+
+    def run_worker(self, load):
+        benchmark.check_worker_database()
+        setup_test_environment()
+        call_command('migrate', verbosity=0)
+        # свой кэш, чтобы замер не зависел от общего
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.'
+                           'LocMemCache'}}):
+            caches['default'].clear()
+            return benchmark.concurrent_load(**load)
+
+    def spawn(self, tuning, load):
+        # отдельный процесс на режим: настройки базы читаются при старте
+        with tempfile.TemporaryDirectory() as directory:
+            env = benchmark.worker_env(directory, SQLITE_TUNING=tuning)
+            args = [sys.executable,
+                    os.path.join(settings.BASE_DIR, 'manage.py'),
+                    'sqlite_benchmark', '--worker']
+            for key, value in load.items():
+                args += [f'--{key}', str(value)]
+            output = subprocess.run(args, env=env, check=True,
+                                    stdout=subprocess.PIPE).stdout
+        return json.loads(output.decode().splitlines()[-1])
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from posts import feed
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Обрезает ленты подписок до FEED_MAX_LENGTH записей'
+
+    def handle(self, *args, **options):
+        users = (User.objects.annotate(entries=Count('feed_entries'))
+                 .filter(entries__gt=settings.FEED_MAX_LENGTH))
+        trimmed = 0
+        for user in users.iterator():
+            feed.trim(user)
+            trimmed += 1
+        self.stdout.write(f'Обрезано лент: {trimmed}')
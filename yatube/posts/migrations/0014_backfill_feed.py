@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.db import migrations
+from yatube.db import bulk_batch_size
+
+
+def backfill_feed(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    for follow in Follow.objects.iterator():
+        posts = (Post.objects.filter(author_id=follow.author_id)
+                 .order_by('-pub_date', '-id')
+                 .values_list('id', 'pub_date')[:settings.FEED_MAX_LENGTH])
+        FeedEntry.objects.bulk_create(
+            (FeedEntry(user_id=follow.user_id, post_id=post_id,
+                       pub_date=pub_date)
+             for post_id, pub_date in posts),
+            batch_size=bulk_batch_size(FeedEntry, settings.FEED_BATCH_SIZE,
+                                       schema_editor.connection.alias),
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_feedentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_feed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='derivatives',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+from posts.stemmer import stems
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+        "body, tokenize='unicode61 remove_diacritics 2')")
+    for post_id, text in Post.objects.values_list('id', 'text').iterator():
+        schema_editor.execute(
+            'INSERT INTO posts_post_fts (rowid, body) VALUES (%s, %s)',
+            [post_id, ' '.join(stems(text))])
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_derivatives'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.6 on 2026-10-18 18:32
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def drop_queued_duplicates(apps, schema_editor):
+    # проверка перед вставкой могла пропустить дубли, оставляем старшие
+    Job = apps.get_model('posts', 'Job')
+    queued = Job.objects.filter(state='queued').exclude(key='')
+    keep = (queued.values('name', 'key').annotate(first=Min('id'))
+            .values_list('first', flat=True))
+    queued.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobLock',
+            fields=[
+                ('name', models.CharField(max_length=200, primary_key=True, serialize=False)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='job',
+            name='job_name_key_idx',
+        ),
+        migrations.RunPython(drop_queued_duplicates,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('state', 'queued'), models.Q(_negated=True, key='')), fields=('name', 'key'), name='unique_queued_job'),
+        ),
+    ]
@@ -1,25 +1,77 @@
+import json
+
 from django.db import models
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.utils import timezone
 
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты вместе с автором и группой одним запросом."""
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField("date published", auto_now_add=True)
+    updated = models.DateTimeField("date updated", auto_now=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name="posts")
     group = models.ForeignKey('Group', on_delete=models.SET_NULL,
                               related_name="posts", blank=True, null=True)
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    thumbnail = models.CharField(max_length=255, blank=True, editable=False)
+    # JSON: [{"width": 480, "webp": "...", "fallback": "..."}, ...]
+    derivatives = models.TextField(blank=True, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        # группа в базе: при переносе поста сбрасываются обе ленты групп
+        post.saved_group_id = post.__dict__.get('group_id')
+        return post
+
+    @property
+    def thumbnail_url(self):
+        return default_storage.url(self.thumbnail)
+
+    @property
+    def image_sources(self):
+        """Размеры картинки карточки: ширина и адреса WebP и запасного.
+
+        Без кодека WebP у Pillow адреса WebP нет (None).
+        """
+        try:
+            derivatives = json.loads(self.derivatives)
+        except ValueError:
+            return []
+        return [{'width': item['width'],
+                 'webp': (default_storage.url(item['webp'])
+                          if item.get('webp') else None),
+                 'fallback': default_storage.url(item['fallback'])}
+                for item in derivatives]
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -45,6 +97,10 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_id_idx'),
+        ]
 
     def __str__(self):
         return self.post.text
@@ -61,6 +117,132 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique_object'),
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
 
     def __str__(self):
         return self.user
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="feed_entries")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="feed_entries")
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_feed_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_user_pub_date_post_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class Notification(models.Model):
+    """Уведомление подписчику о новых постах автора.
+
+    Пока уведомление не прочитано, следующие посты того же автора
+    добавляются в него, а не создают новые строки.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="notifications")
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="+")
+    # последний из новых постов
+    post = models.ForeignKey(Post, on_delete=models.SET_NULL,
+                             related_name="+", blank=True, null=True)
+    posts_count = models.PositiveIntegerField(default=1)
+    created = models.DateTimeField()
+    read = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['-created']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    condition=models.Q(read=False),
+                                    name='unique_unread_notification'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created'],
+                         name='notification_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.author_id} ({self.posts_count})'
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые поддерживаются при записи."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name="stats")
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди на базе (см. posts/jobs.py).
+
+    Выполненные задачи удаляются, упавшие после всех попыток остаются
+    со статусом failed и текстом ошибки.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATES = [(QUEUED, 'В очереди'), (RUNNING, 'Выполняется'),
+              (FAILED, 'Ошибка')]
+
+    name = models.CharField(max_length=200)
+    # JSON с аргументами задачи
+    payload = models.TextField(default='{}')
+    # одинаковые задачи с ключом не ставятся в очередь дважды
+    key = models.CharField(max_length=200, blank=True)
+    state = models.CharField(max_length=10, choices=STATES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'run_at'],
+                         name='job_state_run_at_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'key'],
+                condition=models.Q(state='queued') & ~models.Q(key=''),
+                name='unique_queued_job'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
+
+    @property
+    def kwargs(self):
+        return json.loads(self.payload)
+
+
+class JobLock(models.Model):
+    """Строка задачи с ограничением concurrency: воркер блокирует её,
+    пока считает выполняющиеся пачки и забирает свою."""
+    name = models.CharField(max_length=200, primary_key=True)
+
+    def __str__(self):
+        return self.name
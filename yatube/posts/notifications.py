@@ -0,0 +1,87 @@
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from yatube.db import bulk_batch_size
+
+from . import jobs
+from .models import Follow, Notification, Post
+
+
+def unread_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def unread_count(user):
+    """Число непрочитанных уведомлений для меню: из кэша, а при промахе
+    одним COUNT по частичному уникальному индексу непрочитанных."""
+    if not user.is_authenticated:
+        return 0
+    key = unread_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        # значение живёт до следующего уведомления, поэтому с primary
+        count = (Notification.objects.using(DEFAULT_DB_ALIAS)
+                 .filter(user=user, read=False).count())
+        cache.set(key, count, settings.NOTIFICATIONS_CACHE_TIMEOUT)
+    return count
+
+
+def mark_read(user):
+    """Отмечает уведомления прочитанными; прочитанные раньше удаляются,
+    чтобы у пользователя не копилась история."""
+    Notification.objects.filter(user=user, read=True).delete()
+    Notification.objects.filter(user=user, read=False).update(read=True)
+    cache.delete(unread_key(user.pk))
+
+
+@jobs.task(batch_size=100)
+def notify_followers(payloads):
+    """Уведомляет подписчиков о новых постах.
+
+    Посты одного автора из пачки задач сливаются в одно уведомление,
+    так что серия постов не плодит строки у каждого подписчика.
+    """
+    posts = (Post.objects.filter(pk__in=[kwargs['post_id']
+                                         for kwargs in payloads])
+             .order_by('pub_date', 'id'))
+    latest = {}
+    counts = Counter()
+    for post in posts:
+        latest[post.author_id] = post
+        counts[post.author_id] += 1
+    for author_id, post in latest.items():
+        notify(post, counts[author_id])
+
+
+def notify(post, posts_count):
+    followers = Follow.objects.filter(author_id=post.author_id)
+    unread = Notification.objects.filter(author_id=post.author_id,
+                                         read=False)
+    # у кого уже есть непрочитанное от автора, счётчик растёт на месте
+    unread.filter(user__in=followers.values('user_id')).update(
+        post=post, posts_count=F('posts_count') + posts_count,
+        created=post.pub_date)
+    # остальным — новые строки; если кто-то успел получить уведомление
+    # между запросами, вставку пропустит частичный уникальный индекс
+    user_ids = (followers.exclude(user__in=unread.values('user_id'))
+                .values_list('user_id', flat=True).iterator())
+    while True:
+        chunk = list(islice(user_ids, settings.NOTIFICATIONS_BATCH_SIZE))
+        if not chunk:
+            break
+        Notification.objects.bulk_create(
+            (Notification(user_id=user_id, author_id=post.author_id,
+                          post=post, posts_count=posts_count,
+                          created=post.pub_date)
+             for user_id in chunk),
+            batch_size=bulk_batch_size(Notification,
+                                       settings.NOTIFICATIONS_BATCH_SIZE),
+            ignore_conflicts=True,
+        )
+        # до фиксации другой запрос мог бы закэшировать старое число
+        keys = [unread_key(user_id) for user_id in chunk]
+        transaction.on_commit(lambda keys=keys: cache.delete_many(keys))
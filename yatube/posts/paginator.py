@@ -0,0 +1,140 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+from yatube import caching
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по убыванию пары полей (по умолчанию pub_date, id).
+
+    Вместо COUNT(*) и OFFSET страница выбирается условием
+    ``(pub_date, id) < (курсор)``, поэтому стоимость запроса не зависит
+    от глубины страницы. Объект пагинатора описывает одну страницу:
+    после ``get_page`` в нём лежат курсоры соседних страниц.
+    """
+
+    cursor_based = True
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id')):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        return self._num_pages
+
+    def encode_cursor(self, direction, obj):
+        values = [getattr(obj, key) for key in self.keys]
+        raw = json.dumps([direction, values], default=str)
+        token = base64.urlsafe_b64encode(raw.encode())
+        return token.decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded))
+            if (direction not in (NEXT, PREVIOUS)
+                    or len(values) != len(self.keys)):
+                return None
+            return direction, [self.to_python(key, value)
+                               for key, value in zip(self.keys, values)]
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            return None
+
+    def to_python(self, key, value):
+        return self.object_list.model._meta.get_field(key).to_python(value)
+
+    def _after(self, values, lookup, keys=None):
+        first, second = keys or self.keys
+        return (Q(**{f'{first}__{lookup}': values[0]})
+                | Q(**{first: values[0], f'{second}__{lookup}': values[1]}))
+
+    def ordered(self, queryset, direction, values, keys=None):
+        """Строки после курсора в порядке обхода страницы."""
+        keys = keys or self.keys
+        if direction == PREVIOUS:
+            return (queryset.filter(self._after(values, 'gt', keys))
+                    .order_by(*keys))
+        if values is not None:
+            queryset = queryset.filter(self._after(values, 'lt', keys))
+        return queryset.order_by(*[f'-{key}' for key in keys])
+
+    def fetch(self, direction, values):
+        """До per_page + 1 строк после курсора в порядке обхода."""
+        return list(self.ordered(self.object_list, direction, values)
+                    [:self.per_page + 1])
+
+    def get_page(self, cursor=None):
+        decoded = self.decode_cursor(cursor) if cursor else None
+        direction, values = decoded or (NEXT, None)
+        rows = self.fetch(direction, values)
+        if direction == PREVIOUS:
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = values is not None
+        return self._page(rows, has_next, has_previous)
+
+    def get_cached_page(self, cache_key):
+        """Первая страница, чей состав (id постов) берётся из общего кэша.
+
+        Сами строки читаются по первичному ключу, поэтому правки постов
+        видны сразу, а ключ нужно сбрасывать только при смене состава.
+        """
+        def first_page_ids():
+            descending = [f'-{key}' for key in self.keys]
+            # общий для всех состав читается с primary: отстающая
+            # реплика закэшировала бы страницу без нового поста
+            ids = list(self.object_list.using(DEFAULT_DB_ALIAS)
+                       .order_by(*descending)
+                       .values_list('id', flat=True)[:self.per_page + 1])
+            return ids[:self.per_page], len(ids) > self.per_page
+
+        ids, has_next = caching.get_or_compute(
+            cache_key, first_page_ids, settings.FEED_CACHE_TIMEOUT)
+        rows = self.object_list.in_bulk(ids)
+        return self._page([rows[pk] for pk in ids if pk in rows],
+                          has_next, False)
+
+    def _page(self, rows, has_next, has_previous):
+        if rows and has_next:
+            self.next_cursor = self.encode_cursor(NEXT, rows[-1])
+        if rows and has_previous:
+            self.previous_cursor = self.encode_cursor(PREVIOUS, rows[0])
+        number = 2 if self.previous_cursor else 1
+        self._num_pages = number + 1 if self.next_cursor else number
+        return Page(rows, number, self)
+
+
+def get_page(request, object_list, per_page=None, cache_key=None,
+             numbered=True):
+    """Страница ленты: курсорная по умолчанию, нумерованная по ?page=.
+
+    С ``cache_key`` состав первой страницы хранится в общем кэше,
+    с ``numbered=False`` параметр ?page= не учитывается.
+    """
+    per_page = per_page or settings.POSTS_PER_PAGE
+    if numbered and 'page' in request.GET:
+        object_list = object_list.order_by('-pub_date', '-id')
+        return Paginator(object_list, per_page).get_page(
+            request.GET.get('page'))
+    paginator = CursorPaginator(object_list, per_page)
+    cursor = request.GET.get('cursor')
+    if cache_key and not cursor:
+        return paginator.get_cached_page(cache_key)
+    return paginator.get_page(cursor)
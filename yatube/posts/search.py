@@ -0,0 +1,137 @@
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .models import Post
+from .paginator import NEXT, PREVIOUS, CursorPaginator
+from .stemmer import WORD, stems
+
+
+class SearchBackend:
+    """Интерфейс поискового индекса постов.
+
+    ``search`` возвращает пары ``(score, post_id)``: чем меньше score,
+    тем выше пост в выдаче. ``after`` — такая же пара, от которой
+    продолжается выдача (вперёд или назад по ``direction``).
+    """
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def search(self, query, limit, after=None, direction=NEXT):
+        raise NotImplementedError
+
+
+class SimpleSearchBackend(SearchBackend):
+    """Поиск без индекса: LIKE по тексту, свежие посты выше."""
+
+    def search(self, query, limit, after=None, direction=NEXT):
+        words = WORD.findall(query)
+        if not words:
+            return []
+        posts = Post.objects.all()
+        for word in words:
+            posts = posts.filter(text__icontains=word)
+        if after is not None:
+            lookup = 'lt' if direction == NEXT else 'gt'
+            posts = posts.filter(**{f'id__{lookup}': after[1]})
+        order = '-id' if direction == NEXT else 'id'
+        ids = posts.order_by(order).values_list('id', flat=True)[:limit]
+        return [(-post_id, post_id) for post_id in ids]
+
+
+class SqliteFTSBackend(SearchBackend):
+    """Инвертированный индекс SQLite FTS5 по основам слов, ранжирование bm25.
+
+    Таблица posts_post_fts создаётся миграцией, rowid совпадает с id поста.
+    """
+
+    table = 'posts_post_fts'
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s',
+                           [post.pk])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, body) VALUES (%s, %s)',
+                [post.pk, ' '.join(stems(post.text))])
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s',
+                           [post_id])
+
+    def search(self, query, limit, after=None, direction=NEXT):
+        terms = ' '.join(f'"{term}"*' for term in stems(query))
+        if not terms:
+            return []
+        sql = (f'SELECT score, id FROM ('
+               f'SELECT bm25({self.table}) AS score, rowid AS id '
+               f'FROM {self.table} WHERE {self.table} MATCH %s)')
+        params = [terms]
+        if after is not None:
+            sign = '>' if direction == NEXT else '<'
+            sql += f' WHERE score {sign} %s OR (score = %s AND id {sign} %s)'
+            params += [after[0], after[0], after[1]]
+        order = 'score, id' if direction == NEXT else 'score DESC, id DESC'
+        sql += f' ORDER BY {order} LIMIT %s'
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return cursor.fetchall()
+
+
+def get_backend():
+    path = settings.POSTS_SEARCH_BACKEND
+    if path is None:
+        path = ('posts.search.SqliteFTSBackend'
+                if connection.vendor == 'sqlite'
+                else 'posts.search.SimpleSearchBackend')
+    return import_string(path)()
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорная выдача поиска по паре (score, id) вместо полей модели."""
+
+    def __init__(self, query, per_page, backend=None):
+        super().__init__(Post.objects.for_feed(), per_page,
+                         keys=('search_score', 'id'))
+        self.query = query
+        self.backend = backend or get_backend()
+
+    def to_python(self, key, value):
+        return float(value) if key == 'search_score' else int(value)
+
+    def get_page(self, cursor=None):
+        decoded = self.decode_cursor(cursor) if cursor else None
+        direction, after = decoded or (NEXT, None)
+        hits = self.backend.search(self.query, self.per_page + 1,
+                                   after, direction)
+        more = len(hits) > self.per_page
+        hits = hits[:self.per_page]
+        if direction == PREVIOUS:
+            hits.reverse()
+        posts = self.object_list.in_bulk([post_id for _, post_id in hits])
+        rows = []
+        for score, post_id in hits:
+            if post_id in posts:
+                posts[post_id].search_score = score
+                rows.append(posts[post_id])
+        if direction == PREVIOUS:
+            return self._page(rows, True, more)
+        return self._page(rows, more, after is not None)
+
+
+def reindex(posts):
+    """Заново индексирует посты, сохранённые мимо сигналов."""
+    backend = get_backend()
+    for post in posts.only('id', 'text').iterator():
+        backend.index(post)
+
+
+def search_posts(queryset, query, limit):
+    """Фильтр queryset по результатам поиска, для админки."""
+    hits = get_backend().search(query, limit)
+    return queryset.filter(id__in=[post_id for _, post_id in hits])
@@ -0,0 +1,245 @@
+import datetime as dt
+import random
+import secrets
+from bisect import bisect
+from contextlib import contextmanager
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import counters, feed, http_cache, search
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+WORDS = (
+    'жизнь день город дом друг работа утро вечер море лес дорога книга '
+    'музыка кино кофе чай погода солнце дождь снег зима лето весна осень '
+    'поезд самолёт отпуск семья кот собака парк река гора небо звезда '
+    'новость история мысль идея проект код сервер база запрос страница '
+    'хороший новый старый большой маленький быстрый тихий красивый '
+    'смотреть читать писать думать гулять ехать любить знать делать'
+).split()
+
+
+class Zipf:
+    """Выбор элемента с вероятностью, обратной степени его ранга.
+
+    Так распределены подписчики в соцсетях: немногие авторы собирают
+    большую часть подписок, у остальных их единицы.
+    """
+
+    def __init__(self, items, alpha, rng):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = list(accumulate(
+            1 / rank ** alpha for rank in range(1, len(self.items) + 1)))
+        self.rng = rng
+
+    def choice(self):
+        point = self.rng.random() * self.cum_weights[-1]
+        return self.items[bisect(self.cum_weights, point)]
+
+
+@contextmanager
+def manual_dates():
+    """Даёт задать даты постов и комментариев при bulk_create."""
+    fields = [Post._meta.get_field('pub_date'),
+              Post._meta.get_field('updated'),
+              Comment._meta.get_field('created')]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def heavy_tail(rng, mean, alpha=1.5):
+    """Целое со средним около mean и тяжёлым хвостом Парето."""
+    return int(mean * rng.paretovariate(alpha) * (alpha - 1) / alpha)
+
+
+def text(rng, words=12):
+    return ' '.join(rng.choices(WORDS, k=max(1, heavy_tail(rng, words))))
+
+
+def bursts(rng, count, start, end):
+    """Моменты публикаций сериями: пачка постов с паузой в минуты,
+    между пачками — дни."""
+    moments = []
+    span = (end - start).total_seconds()
+    while len(moments) < count:
+        moment = start + dt.timedelta(seconds=rng.uniform(0, span))
+        for _ in range(min(count - len(moments), 1 + heavy_tail(rng, 3))):
+            moments.append(min(moment, end))
+            moment += dt.timedelta(seconds=rng.expovariate(1 / 300))
+    return moments
+
+
+def created_ids(model, start_id):
+    return list(model.objects.filter(id__gt=start_id)
+                .order_by('id').values_list('id', flat=True))
+
+
+def max_id(model):
+    return model.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+class Seeder:
+    """Массовая загрузка правдоподобных данных через bulk_create.
+
+    Объекты копятся в буфере и пишутся пачками по batch_size, поэтому
+    память не растёт с объёмом. Вся загрузка идёт одной транзакцией:
+    так SQLite не синхронизирует диск после каждой вставки. Сигналы
+    при bulk_create не срабатывают, поэтому счётчики, ленты и поисковый
+    индекс пересчитываются в конце, а кэш лент сбрасывается после
+    фиксации.
+    """
+
+    def __init__(self, batch_size=5000, seed=None, days=365, log=None):
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.token = secrets.token_hex(3) if seed is None else str(seed)
+        self.end = timezone.now()
+        self.start = self.end - dt.timedelta(days=days)
+        self.log = log or (lambda message: None)
+        self.buffer = []
+
+    def add(self, obj):
+        self.buffer.append(obj)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            # размер одного INSERT Django выберет сам по лимитам базы
+            type(self.buffer[0]).objects.bulk_create(
+                self.buffer, ignore_conflicts=True)
+            self.buffer = []
+
+    def users(self, count):
+        start_id = max_id(User)
+        password = make_password(None)
+        for number in range(count):
+            self.add(User(username=f'seed{self.token}_{number}',
+                          password=password, date_joined=self.start))
+        self.flush()
+        self.log(f'Пользователей: {count}')
+        return created_ids(User, start_id)
+
+    def groups(self, count):
+        start_id = max_id(Group)
+        for number in range(count):
+            slug = f'seed-{self.token}-{number}'
+            self.add(Group(title=text(self.rng, 2).capitalize()[:200],
+                           slug=slug, description=text(self.rng)))
+        self.flush()
+        self.log(f'Групп: {count}')
+        return created_ids(Group, start_id)
+
+    def follows(self, user_ids, per_user, alpha=1.1):
+        authors = Zipf(user_ids, alpha, self.rng)
+        total = 0
+        for user_id in user_ids:
+            wanted = min(heavy_tail(self.rng, per_user), len(user_ids) - 1)
+            chosen = set()
+            for _ in range(wanted * 2):
+                if len(chosen) >= wanted:
+                    break
+                author_id = authors.choice()
+                if author_id != user_id:
+                    chosen.add(author_id)
+            for author_id in chosen:
+                self.add(Follow(user_id=user_id, author_id=author_id))
+            total += len(chosen)
+        self.flush()
+        self.log(f'Подписок: {total}')
+
+    def posts(self, user_ids, group_ids, per_user):
+        start_id = max_id(Post)
+        groups = Zipf(group_ids, 1.0, self.rng) if group_ids else None
+        total = 0
+        with manual_dates():
+            for user_id in user_ids:
+                count = heavy_tail(self.rng, per_user)
+                for moment in bursts(self.rng, count, self.start, self.end):
+                    group_id = (groups.choice()
+                                if groups and self.rng.random() < 0.5
+                                else None)
+                    self.add(Post(author_id=user_id, group_id=group_id,
+                                  text=text(self.rng), pub_date=moment,
+                                  updated=moment))
+                total += count
+            self.flush()
+        self.log(f'Постов: {total}')
+        return start_id
+
+    def comments(self, user_ids, posts, per_post):
+        commenters = Zipf(user_ids, 1.0, self.rng)
+        total = 0
+        with manual_dates():
+            rows = posts.values_list('id', 'pub_date')
+            for post_id, pub_date in rows.iterator():
+                count = heavy_tail(self.rng, per_post)
+                for _ in range(count):
+                    delay = dt.timedelta(
+                        seconds=self.rng.expovariate(1 / 3600))
+                    self.add(Comment(post_id=post_id,
+                                     author_id=commenters.choice(),
+                                     text=text(self.rng, 8),
+                                     created=min(pub_date + delay, self.end)))
+                total += count
+            self.flush()
+        self.log(f'Комментариев: {total}')
+
+    def run(self, users, groups, posts, comments, follows,
+            rebuild_feeds=True, reindex=True):
+        with transaction.atomic():
+            user_ids, group_ids = self.load(users, groups, posts, comments,
+                                            follows, rebuild_feeds, reindex)
+        if user_ids:
+            self.expire_caches(user_ids, group_ids)
+
+    def load(self, users, groups, posts, comments, follows,
+             rebuild_feeds, reindex):
+        user_ids = self.users(users)
+        if not user_ids:
+            return [], []
+        group_ids = self.groups(groups)
+        self.follows(user_ids, follows)
+        posts_start = self.posts(user_ids, group_ids, posts)
+        new_posts = Post.objects.filter(id__gt=posts_start)
+        self.comments(user_ids, new_posts, comments)
+        counters.recount_all()
+        self.log('Счётчики пересчитаны')
+        if rebuild_feeds and user_ids:
+            seeded = User.objects.filter(id__gte=user_ids[0]).only('id')
+            for user in seeded.iterator():
+                feed.rebuild(user)
+            self.log('Ленты собраны')
+        if reindex:
+            search.reindex(new_posts)
+            self.log('Поисковый индекс обновлён')
+        return user_ids, group_ids
+
+    def expire_caches(self, user_ids, group_ids):
+        """Сдвигает Last-Modified и сбрасывает закэшированные первые
+        страницы лент, которые сигналы сбросили бы при обычной записи.
+
+        id после очистки базы начинаются заново, поэтому отметки новых
+        пользователей и групп могли остаться от прежних.
+        """
+        http_cache.touch('index', 'follow',
+                         *(f'profile:{pk}' for pk in user_ids),
+                         *(f'group:{pk}' for pk in group_ids))
+        cache.delete_many([feed.INDEX_CACHE_KEY]
+                          + [feed.group_cache_key(pk) for pk in group_ids])
+        self.log('Кэш лент сброшен')
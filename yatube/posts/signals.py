@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import counters, feed, http_cache, notifications, search
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def create_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    feed.expire_cached_pages(instance)
+    previous_group_id = getattr(instance, 'saved_group_id', None)
+    http_cache.touch_post(instance.author_id, instance.group_id,
+                          previous_group_id)
+    instance.saved_group_id = instance.group_id
+    search.get_backend().index(instance)
+    if created:
+        counters.bump_stats(instance.author_id, posts_count=1)
+        feed.fan_out.delay(post_id=instance.pk)
+        notifications.notify_followers.delay(post_id=instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    feed.expire_cached_pages(instance)
+    http_cache.touch_post(instance.author_id, instance.group_id)
+    search.get_backend().remove(instance.pk)
+    counters.bump_stats(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Group)
+def expire_group_cards(sender, instance, created, **kwargs):
+    # карточки постов показывают группу, поэтому их версия меняется
+    if not created:
+        instance.posts.update(updated=timezone.now())
+        http_cache.touch('index', f'group:{instance.id}')
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_comments(instance.post_id, 1)
+        touch_commented(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.bump_comments(instance.post_id, -1)
+    touch_commented(instance.post_id)
+
+
+def touch_commented(post_id):
+    # число комментариев выводится в карточке поста во всех лентах
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'group_id').first()
+    if post:
+        http_cache.touch_post(post['author_id'], post['group_id'])
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_stats(instance.author_id, followers_count=1)
+        counters.bump_stats(instance.user_id, following_count=1)
+        # посты знаменитостей попадают в ленту сразу, без backfill
+        http_cache.touch(f'profile:{instance.author_id}',
+                         f'profile:{instance.user_id}',
+                         f'follow:{instance.user_id}')
+        feed.backfill.delay(user_id=instance.user_id,
+                            author_id=instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def drop_from_feed(sender, instance, **kwargs):
+    feed.unfollowed(instance.author_id)
+    counters.bump_stats(instance.user_id, following_count=-1)
+    http_cache.touch(f'profile:{instance.author_id}',
+                     f'profile:{instance.user_id}')
+    feed.drop(instance.user, instance.author)
@@ -0,0 +1,9 @@
+from django import template
+
+
+register = template.Library()
+
+
+@register.filter
+def is_author(post, user):
+    return post.author_id == user.pk
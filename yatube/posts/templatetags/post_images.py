@@ -0,0 +1,32 @@
+from django import template
+from django.utils.html import format_html
+
+
+register = template.Library()
+
+SIZES = '(max-width: 576px) 100vw, 960px'
+
+
+def srcset(sources, kind):
+    return ', '.join(f"{item[kind]} {item['width']}w" for item in sources)
+
+
+@register.simple_tag
+def post_picture(post):
+    """<picture> с WebP-набором и запасными картинками исходного формата."""
+    sources = post.image_sources
+    if not sources:
+        return format_html('<img class="card-img" src="{}" />',
+                           post.thumbnail_url)
+    if not all(item['webp'] for item in sources):
+        return format_html(
+            '<img class="card-img" src="{}" srcset="{}" sizes="{}" />',
+            post.thumbnail_url, srcset(sources, 'fallback'), SIZES)
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}" />'
+        '<img class="card-img" src="{}" srcset="{}" sizes="{}" />'
+        '</picture>',
+        srcset(sources, 'webp'), SIZES,
+        post.thumbnail_url, srcset(sources, 'fallback'), SIZES,
+    )
@@ -0,0 +1,126 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Oleg')
+        cls.group = Group.objects.create(title='Жора', slug='Jora')
+        cls.post = Post.objects.create(text='Хорошая жизнь', author=cls.user,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ApiTests.user)
+
+    def test_feeds_serialized(self):
+        """Тест для проверки JSON всех лент"""
+        Follow.objects.create(user=User.objects.create_user(username='Fan'),
+                              author=ApiTests.user)
+        urls = [
+            reverse('api_index'),
+            reverse('api_group_posts', kwargs={'slug': 'Jora'}),
+            reverse('api_profile', kwargs={'username': 'Oleg'}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(data['results'][0]['text'], 'Хорошая жизнь')
+                self.assertEqual(data['results'][0]['group'], 'Jora')
+                self.assertIsNone(data['next'])
+        data = self.client.get(
+            reverse('api_profile', kwargs={'username': 'Oleg'})).json()
+        self.assertEqual(data['author']['followers'], 1)
+
+    def test_page_param_ignored(self):
+        """Тест для проверки, что ?page= не ломает курсорные ленты API"""
+        Follow.objects.create(user=ApiTests.user,
+                              author=User.objects.create_user(username='Ira'))
+        urls = [
+            reverse('api_index'),
+            reverse('api_group_posts', kwargs={'slug': 'Jora'}),
+            reverse('api_profile', kwargs={'username': 'Oleg'}),
+            reverse('api_follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url, {'page': 1})
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIsNone(response.json()['next'])
+
+    def test_follow_feed_needs_login(self):
+        """Тест для проверки, что лента подписок требует авторизации"""
+        response = self.client.get(reverse('api_follow_index'))
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        response = self.authorized_client.get(reverse('api_follow_index'))
+        self.assertEqual(response.json()['results'], [])
+
+    def test_etag_not_modified_until_comment(self):
+        """Тест для проверки 304 по ETag и новой версии
+        после комментария
+        """
+        url = reverse('api_post', kwargs={'username': 'Oleg',
+                                          'post_id': ApiTests.post.id})
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(response.json()['comment_list'], [])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        Comment.objects.create(post=ApiTests.post, author=ApiTests.user,
+                               text='Комментарий')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['comments'], 1)
+
+    def test_feed_etag(self):
+        """Тест для проверки 304 для ленты и сброса после нового поста"""
+        url = reverse('api_index')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(text='Новый пост', author=ApiTests.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_follow_feed_etag(self):
+        """Тест для проверки приватного ответа ленты подписок и 304
+        без чтения ленты из базы
+        """
+        url = reverse('api_follow_index')
+        author = User.objects.create_user(username='Writer')
+        response = self.authorized_client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(
+                url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertFalse([query for query in queries
+                          if 'posts_' in query['sql']])
+
+        Follow.objects.create(user=ApiTests.user, author=author)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        etag = response['ETag']
+        Post.objects.create(text='Для подписчиков', author=author)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['results'][0]['text'],
+                         'Для подписчиков')
@@ -0,0 +1,192 @@
+import asyncio
+import threading
+from contextvars import ContextVar
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import SimpleTestCase, TransactionTestCase
+from django.urls import reverse
+from posts.models import Post
+from yatube import parallel
+from yatube.asgi import ASGIHandler, scope_to_environ
+
+User = get_user_model()
+
+
+def call(application, scope, *chunks):
+    """Начало ответа и части его тела."""
+    messages = []
+    chunks = list(chunks) or [b'']
+
+    async def receive():
+        return {'type': 'http.request', 'body': chunks.pop(0),
+                'more_body': bool(chunks)}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    return messages[0], [message['body'] for message in messages[1:]]
+
+
+def http_scope(path, method='GET', headers=()):
+    return {'type': 'http', 'method': method, 'path': path,
+            'query_string': b'', 'client': ('127.0.0.1', 5000),
+            'headers': [(b'host', b'testserver'), *headers]}
+
+
+class ScopeToEnvironTests(SimpleTestCase):
+    def test_environ(self):
+        """Тест для проверки перевода запроса ASGI в WSGI environ"""
+        environ = scope_to_environ(http_scope('/пост/', 'POST', [
+            (b'content-type', b'text/plain'),
+            (b'cookie', b'a=1'), (b'cookie', b'b=2'),
+        ]), b'text')
+        self.assertEqual(environ['PATH_INFO'].encode('latin-1').decode(),
+                         '/пост/')
+        self.assertEqual(environ['CONTENT_TYPE'], 'text/plain')
+        self.assertEqual(environ['HTTP_COOKIE'], 'a=1; b=2')
+        self.assertEqual(environ['REMOTE_ADDR'], '127.0.0.1')
+        self.assertEqual(environ['wsgi.input'].read(), b'text')
+
+
+class ASGIHandlerTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='Writer',
+                                          password='secret-42')
+        Post.objects.create(text='Пост через ASGI', author=author)
+        self.application = ASGIHandler(threads=2)
+
+    def tearDown(self):
+        self.application.executor.shutdown()
+
+    def test_get(self):
+        """Тест для проверки страницы через ASGI"""
+        start, body = call(self.application, http_scope(reverse('index')))
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'vary', b'Cookie'), start['headers'])
+        self.assertIn('Пост через ASGI', b''.join(body).decode())
+
+    def test_post_body(self):
+        """Тест для проверки передачи тела запроса"""
+        token = 'a' * 64
+        start, _ = call(self.application, http_scope(
+            reverse('login'), 'POST',
+            [(b'content-type', b'application/x-www-form-urlencoded'),
+             (b'cookie', f'csrftoken={token}'.encode())]),
+            f'username=Writer&password=secret-42&csrfmiddlewaretoken={token}'
+            .encode())
+        self.assertEqual(start['status'], 302)
+        self.assertTrue(any(name == b'set-cookie'
+                            and value.startswith(b'sessionid=')
+                            for name, value in start['headers']))
+
+    def test_body_in_chunks(self):
+        """Тест для проверки тела запроса из нескольких сообщений"""
+        received = []
+
+        def application(environ, start_response):
+            received.append(environ['wsgi.input'].read(
+                int(environ['CONTENT_LENGTH'])))
+            start_response('200 OK', [])
+            return [b'']
+
+        self.application.wsgi = application
+        with self.settings(FILE_UPLOAD_MAX_MEMORY_SIZE=4):
+            call(self.application, http_scope('/', 'POST'),
+                 b'part1-', b'part2')
+        self.assertEqual(received, [b'part1-part2'])
+
+    def test_body_too_large(self):
+        """Тест для проверки отказа в слишком большом теле запроса"""
+        with self.settings(ASGI_MAX_BODY_SIZE=8):
+            start, body = call(self.application, http_scope('/', 'POST'),
+                               b'12345', b'67890')
+            self.assertEqual(start['status'], 413)
+            start, _ = call(self.application, http_scope(
+                '/', 'POST', [(b'content-length', b'100')]))
+            self.assertEqual(start['status'], 413)
+
+    def test_streaming_response(self):
+        """Тест для проверки отправки ответа по частям"""
+        def application(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            yield b'first'
+            yield b'second'
+
+        self.application.wsgi = application
+        start, body = call(self.application, http_scope('/'))
+        self.assertEqual(start['status'], 200)
+        self.assertEqual(body, [b'first', b'second', b''])
+
+    def test_lifespan(self):
+        """Тест для проверки запуска и остановки сервера"""
+        messages = iter([{'type': 'lifespan.startup'},
+                         {'type': 'lifespan.shutdown'}])
+        sent = []
+
+        async def receive():
+            return next(messages)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(self.application({'type': 'lifespan'}, receive, send))
+        self.assertEqual(sent, ['lifespan.startup.complete',
+                                'lifespan.shutdown.complete'])
+
+
+class GatherTests(SimpleTestCase):
+    def test_inline_on_test_database(self):
+        """Тест для проверки, что на in-memory SQLite вызовы идут по очереди"""
+        self.assertFalse(parallel.runs_concurrently())
+        self.assertEqual(parallel.gather(lambda: 1, lambda: 2), [1, 2])
+
+    def test_inline_with_connection_pool(self):
+        """Тест для проверки, что с пулом соединений вызовы идут по очереди:
+        потоки gather не ждут соединений, которые держат запросы"""
+        with mock.patch.object(type(connections['default']),
+                               'is_in_memory_db',
+                               return_value=False):
+            self.assertTrue(parallel.runs_concurrently())
+            with mock.patch.dict(connections['default'].settings_dict,
+                                 {'POOL': {'size': 2}}):
+                self.assertFalse(parallel.runs_concurrently())
+
+    def test_concurrent(self):
+        """Тест для проверки одновременных вызовов с контекстом запроса"""
+        request_id = ContextVar('request_id')
+        request_id.set(7)
+        barrier = threading.Barrier(2, timeout=5)
+
+        def work(result):
+            # оба вызова должны дойти сюда одновременно
+            barrier.wait()
+            return result, request_id.get(), threading.get_ident()
+
+        with mock.patch.object(parallel, 'runs_concurrently',
+                               return_value=True):
+            first, second = parallel.gather(lambda: work('a'),
+                                            lambda: work('b'))
+        self.assertEqual((first[:2], second[:2]), (('a', 7), ('b', 7)))
+        self.assertNotEqual(first[2], second[2])
+
+    def test_wrappers_in_workers(self):
+        """Тест для проверки замеров запросов в потоках пула"""
+        def wrapper(execute, *args):
+            return execute(*args)
+
+        def wrappers():
+            return list(connection.execute_wrappers), threading.get_ident()
+
+        with mock.patch.object(parallel, 'runs_concurrently',
+                               return_value=True):
+            with parallel.wrap_queries(wrapper):
+                first, second = parallel.gather(wrappers, wrappers)
+            _, after = parallel.gather(wrappers, wrappers)
+        self.assertNotEqual(first[1], second[1])
+        self.assertEqual((first[0], second[0]), ([wrapper], [wrapper]))
+        self.assertEqual(after[0], [])
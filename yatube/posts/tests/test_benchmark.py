@@ -0,0 +1,65 @@
+import os
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from posts import benchmark
+from posts.models import Post
+
+User = get_user_model()
+
+
+class BenchmarkTests(TestCase):
+    def test_run_measures_every_view(self):
+        """Тест для проверки, что замер проходит по всем страницам"""
+        results = benchmark.run([60], repeat=2, warmup=1)
+        self.assertEqual(
+            set(results),
+            {f'60/{scenario.name}' for scenario in benchmark.SCENARIOS})
+        for key, result in results.items():
+            with self.subTest(key=key):
+                self.assertGreater(result['queries'], 0)
+                self.assertGreaterEqual(result['p95_ms'], result['p50_ms'])
+                self.assertGreater(result['peak_kb'], 0)
+
+    @override_settings(RATE_LIMITS={'comment': {'user': (1, 60)},
+                                    'follow': {'user': (1, 60)}},
+                       RATE_LIMITS_ENABLED=True)
+    def test_run_ignores_rate_limits(self):
+        """Тест для проверки, что лимиты частоты не мешают замеру"""
+        results = benchmark.run([60], repeat=2, warmup=1)
+        self.assertIn('60/add_comment', results)
+
+    def test_compare_flags_regressions(self):
+        """Тест для проверки сравнения с базовыми замерами"""
+        baseline = {'60/index': {'queries': 3, 'p50_ms': 5,
+                                 'p95_ms': 10, 'peak_kb': 100}}
+        same = {'60/index': {'queries': 3, 'p50_ms': 6,
+                             'p95_ms': 11, 'peak_kb': 110}}
+        worse = {'60/index': {'queries': 4, 'p50_ms': 6,
+                              'p95_ms': 20, 'peak_kb': 110}}
+        self.assertEqual(benchmark.compare(same, baseline, 0.25), [])
+        self.assertEqual(len(benchmark.compare(worse, baseline, 0.25)), 2)
+
+    def test_unexpected_status_aborts(self):
+        """Тест для проверки, что ответ с другим кодом не замеряется"""
+        scenario = benchmark.Scenario('missing', lambda ctx, step: '/нет/')
+        with self.assertRaisesMessage(ValueError, 'missing: ответ 404'):
+            benchmark.measure(self.client, scenario, {}, repeat=1, warmup=0)
+
+    def test_worker_refuses_configured_database(self):
+        """Тест для проверки, что воркер замера не очищает рабочую базу"""
+        Post.objects.create(text='Пост',
+                            author=User.objects.create_user(username='Oleg'))
+        with mock.patch.dict(os.environ):
+            for command in ('sqlite_benchmark', 'asgi_benchmark'):
+                with self.subTest(command=command):
+                    os.environ.pop(benchmark.WORKER_DB_ENV, None)
+                    with self.assertRaises(CommandError):
+                        call_command(command, '--worker')
+                    os.environ[benchmark.WORKER_DB_ENV] = '/tmp/other.db'
+                    with self.assertRaises(CommandError):
+                        call_command(command, '--worker')
+        self.assertEqual(Post.objects.count(), 1)
@@ -0,0 +1,123 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from posts import feed
+from posts.models import Group, Post
+from yatube import caching
+
+User = get_user_model()
+
+
+class GetOrComputeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_suite_uses_private_cache(self):
+        """Тест для проверки, что тесты не сбрасывают общий кэш сайта"""
+        self.assertIsInstance(caches['default'], LocMemCache)
+
+    def test_value_computed_once(self):
+        """Тест для проверки, что свежее значение берётся из кэша"""
+        for _ in range(3):
+            value = caching.get_or_compute('key', self.compute, 60)
+        self.assertEqual(value, 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_locked_key_serves_stale_value(self):
+        """Тест для проверки, что при чужой блокировке
+        отдаётся старое значение, а не идёт второй пересчёт
+        """
+        cache.set('key', ('старое', 1.0, time.time() - 1), 60)
+        caching.lock('key:lock', 10)
+        try:
+            value = caching.get_or_compute('key', self.compute, 60)
+        finally:
+            caching.unlock('key:lock')
+        self.assertEqual(value, 'старое')
+        self.assertEqual(self.calls, 0)
+
+    def test_hot_key_recomputed_early(self):
+        """Тест для проверки раннего пересчёта ключа у конца срока"""
+        cache.set('key', ('старое', 10.0, time.time() + 1), 60)
+        with mock.patch('yatube.caching.random.random', return_value=0.99):
+            value = caching.get_or_compute('key', self.compute, 60)
+        self.assertEqual(value, 1)
+        self.assertTrue(caching.lock('key:lock', 10))
+        caching.unlock('key:lock')
+
+    def test_lock_is_exclusive(self):
+        """Тест для проверки, что блокировку держит один владелец"""
+        self.assertTrue(caching.lock('key:lock', 10))
+        try:
+            self.assertFalse(caching.lock('key:lock', 10))
+        finally:
+            caching.unlock('key:lock')
+        self.assertTrue(caching.lock('key:lock', 10))
+        caching.unlock('key:lock')
+
+    def test_stale_lock_expires(self):
+        """Тест для проверки, что блокировка упавшего процесса истекает"""
+        self.assertTrue(caching.lock('key:lock', 10))
+        with mock.patch('yatube.caching.time.time',
+                        return_value=time.time() + 11):
+            self.assertTrue(caching.lock('key:lock', 10))
+        caching.unlock('key:lock')
+
+
+class CachedFirstPageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Oleg')
+        Post.objects.create(text='Первый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_new_post_resets_index_page(self):
+        """Тест для проверки, что новый пост сразу виден на главной"""
+        self.client.get(reverse('index'))
+        self.assertIsNotNone(cache.get(feed.INDEX_CACHE_KEY))
+        post = Post.objects.create(text='Второй пост',
+                                   author=CachedFirstPageTest.user)
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['page'][0], post)
+
+    def test_edited_post_shown_from_cached_page(self):
+        """Тест для проверки, что правка поста видна
+        при закэшированном составе страницы
+        """
+        self.client.get(reverse('index'))
+        Post.objects.update(text='Исправленный пост',
+                            updated=timezone.now())
+        response = Client().get(reverse('index'))
+        self.assertContains(response, 'Исправленный пост')
+
+    def test_moved_post_resets_both_group_pages(self):
+        """Тест для проверки, что перенос поста сбрасывает первые
+        страницы старой и новой группы
+        """
+        old = Group.objects.create(title='Старая', slug='old')
+        new = Group.objects.create(title='Новая', slug='new')
+        post = Post.objects.create(text='Переезд',
+                                   author=CachedFirstPageTest.user,
+                                   group=old)
+        for group in (old, new):
+            self.client.get(reverse('group_posts',
+                                    kwargs={'slug': group.slug}))
+        post = Post.objects.get(pk=post.pk)
+        post.group = new
+        post.save()
+        self.assertIsNone(cache.get(feed.group_cache_key(old.id)))
+        self.assertIsNone(cache.get(feed.group_cache_key(new.id)))
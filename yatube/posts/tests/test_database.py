@@ -0,0 +1,150 @@
+import os
+import tempfile
+
+from django.db import OperationalError
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+from yatube import database
+from yatube.db_backends import pool
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    def test_sqlite_by_default(self):
+        """Тест для проверки базы по умолчанию"""
+        config = database.from_env({}, '/srv/yatube')
+        self.assertEqual(config['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(config['NAME'], '/srv/yatube/db.sqlite3')
+        self.assertEqual(config['CONN_MAX_AGE'], 60)
+
+    def test_postgres_url(self):
+        """Тест для проверки разбора адреса PostgreSQL"""
+        config = database.from_env({
+            'DATABASE_URL': 'postgres://ya:p%40ss@db:5433/yatube'
+                            '?sslmode=require',
+            'DB_CONN_MAX_AGE': '300',
+        }, '/srv/yatube')
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(
+            (config['NAME'], config['USER'], config['PASSWORD'],
+             config['HOST'], config['PORT']),
+            ('yatube', 'ya', 'p@ss', 'db', '5433'))
+        self.assertEqual(config['OPTIONS'], {'sslmode': 'require'})
+        self.assertEqual(config['CONN_MAX_AGE'], 300)
+
+    def test_pool_switches_engine(self):
+        """Тест для проверки включения пула соединений"""
+        config = database.from_env({
+            'DATABASE_URL': 'postgresql://ya@db/yatube',
+            'DB_POOL_SIZE': '20',
+        }, '/srv/yatube')
+        self.assertEqual(config['ENGINE'], 'yatube.db_backends.postgresql')
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['POOL']['size'], 20)
+
+    def test_sqlite_tuning(self):
+        """Тест для проверки настроек SQLite под нагрузкой"""
+        config = database.from_env({'SQLITE_TUNING': '1'}, '/srv/yatube')
+        self.assertEqual(config['ENGINE'], 'yatube.db_backends.sqlite3')
+        self.assertEqual(config['PRAGMAS']['journal_mode'], 'WAL')
+        self.assertEqual(config['PRAGMAS']['synchronous'], 'NORMAL')
+        self.assertNotIn('POOL', config)
+
+    def test_replicas(self):
+        """Тест для проверки списка реплик"""
+        self.assertEqual(database.replicas_from_env({}, '/srv/yatube'), {})
+        replicas = database.replicas_from_env({
+            'DATABASE_URL': 'postgres://ya@db/yatube',
+            'DATABASE_REPLICA_URLS': 'postgres://ya@db-r1/yatube,'
+                                     'postgres://ya@db-r2/yatube',
+        }, '/srv/yatube')
+        self.assertEqual(list(replicas), ['replica1', 'replica2'])
+        self.assertEqual(replicas['replica2']['HOST'], 'db-r2')
+        self.assertEqual(replicas['replica1']['TEST'], {'MIRROR': 'default'})
+
+
+class PoolTests(SimpleTestCase):
+    def make_pool(self, ping=lambda raw: None, **options):
+        return pool.Pool(FakeConnection, ping, **options)
+
+    def test_released_connection_is_reused(self):
+        """Тест для проверки повторного использования соединения"""
+        connections = self.make_pool(size=2)
+        raw = connections.acquire()
+        connections.release(raw)
+        self.assertIs(connections.acquire(), raw)
+
+    def test_pool_is_bounded(self):
+        """Тест для проверки ограничения размера пула"""
+        connections = self.make_pool(size=1, timeout=0.05)
+        raw = connections.acquire()
+        with self.assertRaises(OperationalError):
+            connections.acquire()
+        connections.release(raw)
+        self.assertIs(connections.acquire(), raw)
+
+    def test_failed_health_check_replaces_connection(self):
+        """Тест для проверки замены соединения, не прошедшего проверку"""
+        def ping(raw):
+            raise OperationalError('server closed the connection')
+
+        connections = self.make_pool(ping=ping, size=1, check_interval=0)
+        raw = connections.acquire()
+        connections.release(raw)
+        fresh = connections.acquire()
+        self.assertIsNot(fresh, raw)
+        self.assertTrue(raw.closed)
+
+    def test_broken_connection_is_discarded(self):
+        """Тест для проверки, что сломанное соединение не вернётся в пул"""
+        connections = self.make_pool(size=1, timeout=0.05)
+        raw = connections.acquire()
+        connections.release(raw, broken=True)
+        self.assertTrue(raw.closed)
+        self.assertIsNot(connections.acquire(), raw)
+
+
+class SqliteBackendTests(SimpleTestCase):
+    def test_pragmas_applied_on_connect(self):
+        """Тест для проверки, что PRAGMA ставятся новому соединению"""
+        with tempfile.TemporaryDirectory() as directory:
+            handler = ConnectionHandler({'default': {}, 'tuned': {
+                'ENGINE': 'yatube.db_backends.sqlite3',
+                'NAME': os.path.join(directory, 'tuned.sqlite3'),
+                'PRAGMAS': database.sqlite_pragmas({}),
+            }})
+            connection = handler['tuned']
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA synchronous')
+                    self.assertEqual(cursor.fetchone()[0], 1)
+            finally:
+                connection.close()
+
+    def test_sqlite_connection_returns_to_pool(self):
+        """Тест для проверки пула в обёртке бэкенда SQLite"""
+        with tempfile.TemporaryDirectory() as directory:
+            handler = ConnectionHandler({'default': {}, 'pooled': {
+                'ENGINE': 'yatube.db_backends.sqlite3',
+                'NAME': os.path.join(directory, 'pooled.sqlite3'),
+                'POOL': {'size': 1, 'timeout': 0.05},
+            }})
+            connection = handler['pooled']
+            try:
+                connection.ensure_connection()
+                raw = connection.connection
+                connection.close()
+                connection.ensure_connection()
+                self.assertIs(connection.connection, raw)
+            finally:
+                connection.close()
+                pool.pools.pop('pooled').discard(raw)
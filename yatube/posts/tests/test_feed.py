@@ -0,0 +1,117 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import counters
+from posts.models import FeedEntry, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.old_post = Post.objects.create(text='Старый пост',
+                                           author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedTests.reader)
+
+    def test_follow_backfills_and_new_post_fans_out(self):
+        """Тест для проверки, что подписка заполняет ленту,
+        а новый пост раскладывается подписчикам
+        """
+        self.authorized_client.get(
+            reverse('profile_follow', kwargs={'username': 'Author'}))
+        self.assertTrue(FeedEntry.objects.filter(
+            user=FeedTests.reader, post=FeedTests.old_post).exists())
+        post = Post.objects.create(text='Новый пост', author=FeedTests.author)
+        entry = FeedEntry.objects.get(user=FeedTests.reader, post=post)
+        self.assertEqual(entry.pub_date, post.pub_date)
+        response = self.authorized_client.get(reverse('follow_index'))
+        self.assertEqual([p.id for p in response.context['page']],
+                         [post.id, FeedTests.old_post.id])
+
+    def test_unfollow_drops_entries(self):
+        """Тест для проверки, что отписка чистит ленту"""
+        Follow.objects.create(user=FeedTests.reader, author=FeedTests.author)
+        self.authorized_client.get(
+            reverse('profile_unfollow', kwargs={'username': 'Author'}))
+        self.assertFalse(
+            FeedEntry.objects.filter(user=FeedTests.reader).exists())
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_celebrity_posts_read_on_the_fly(self):
+        """Тест для проверки, что посты популярных авторов
+        не раскладываются, но попадают в ленту при чтении
+        """
+        Follow.objects.create(user=FeedTests.reader, author=FeedTests.author)
+        post = Post.objects.create(text='Пост звезды', author=FeedTests.author)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        response = self.authorized_client.get(reverse('follow_index'))
+        self.assertIn(post, response.context['page'].object_list)
+
+    @override_settings(FEED_FANOUT_LIMIT=2)
+    def test_former_celebrity_posts_backfilled(self):
+        """Тест для проверки, что посты автора, пока он был знаменитостью,
+        остаются в ленте, когда подписчиков стало меньше порога
+        """
+        fan = User.objects.create_user(username='Fan')
+        Follow.objects.create(user=FeedTests.reader, author=FeedTests.author)
+        Follow.objects.create(user=fan, author=FeedTests.author)
+        post = Post.objects.create(text='Пост звезды', author=FeedTests.author)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        Follow.objects.filter(user=fan).delete()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=FeedTests.reader, post=post).exists())
+        self.assertFalse(FeedEntry.objects.filter(user=fan).exists())
+        response = self.authorized_client.get(reverse('follow_index'))
+        self.assertIn(post, response.context['page'].object_list)
+
+    @override_settings(FEED_MAX_LENGTH=1)
+    def test_backfill_trims_feed(self):
+        """Тест для проверки, что лента обрезается до FEED_MAX_LENGTH"""
+        Post.objects.create(text='Ещё пост', author=FeedTests.author)
+        Follow.objects.create(user=FeedTests.reader, author=FeedTests.author)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=FeedTests.reader).count(), 1)
+
+    @override_settings(FEED_MAX_LENGTH=1)
+    def test_fan_out_trims_feed(self):
+        """Тест для проверки обрезки ленты после раскладки поста"""
+        Follow.objects.create(user=FeedTests.reader, author=FeedTests.author)
+        post = Post.objects.create(text='Свежий пост', author=FeedTests.author)
+        self.assertEqual(
+            list(FeedEntry.objects.filter(user=FeedTests.reader)
+                 .values_list('post_id', flat=True)), [post.id])
+
+    @override_settings(POSTS_PER_PAGE=2, FEED_FANOUT_LIMIT=5)
+    def test_pages_merge_celebrity_posts(self):
+        """Тест для проверки страниц ленты из записей и постов
+        популярных авторов
+        """
+        star = User.objects.create_user(username='Star')
+        counters.get_stats(star)
+        UserStats.objects.filter(user=star).update(followers_count=5)
+        Follow.objects.create(user=FeedTests.reader, author=FeedTests.author)
+        Follow.objects.create(user=FeedTests.reader, author=star)
+        posts = [FeedTests.old_post]
+        for number in range(4):
+            author = star if number % 2 else FeedTests.author
+            posts.append(Post.objects.create(text=f'Пост {number}',
+                                             author=author))
+        self.assertFalse(FeedEntry.objects.filter(post__author=star).exists())
+        seen = []
+        response = self.authorized_client.get(reverse('follow_index'))
+        while True:
+            page = response.context['page']
+            seen += [post.id for post in page]
+            if not page.has_next():
+                break
+            response = self.authorized_client.get(
+                reverse('follow_index'),
+                {'cursor': page.paginator.next_cursor})
+        self.assertEqual(seen, [post.id for post in reversed(posts)])
@@ -1,13 +1,22 @@
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from django.urls import reverse
+from posts import http_cache, thumbnails
 from posts.models import Post, Group
 import datetime as dt
 import shutil
 import tempfile
 from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from io import BytesIO
+from PIL import Image
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopUpload
+from django.test import RequestFactory
+from posts.uploads import CappedTemporaryFileUploadHandler
 from http import HTTPStatus
+from unittest import mock
 
 User = get_user_model()
 
@@ -77,6 +86,136 @@ class PostFormTests(TestCase):
         self.assertEqual(post.group.title, 'Жора')
         self.assertEqual(response.status_code, HTTPStatus.OK)
 
+    def test_thumbnail_made_outside_request(self):
+        """Тест для проверки, что миниатюра считается не в запросе:
+        до готовности показывается заглушка, затем картинка
+        """
+        test_image = SimpleUploadedFile(
+            name='thumb.gif',
+            content=(b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00'
+                     b'\x00\x00\x00\x21\xf9\x04\x01\x00\x00\x00'
+                     b'\x00\x2c\x00\x00\x00\x00\x01\x00\x01\x00'
+                     b'\x00\x02\x01\x00\x00\x3b'),
+            content_type='image/gif'
+        )
+        self.authorized_client.post(
+            reverse('new_post'),
+            data={'text': 'Пост с картинкой', 'image': test_image})
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertEqual(post.thumbnail, '')
+        # страница с заглушкой старше расчёта миниатюры
+        cache.set(http_cache.marker_key('index'),
+                  dt.datetime(2020, 1, 1), timeout=None)
+        response = self.guest_client.get(reverse('index'))
+        self.assertNotContains(response, '<img class="card-img"')
+
+        thumbnails.make_thumbnail(post.id)
+        post.refresh_from_db()
+        self.assertNotEqual(post.thumbnail, '')
+        sources = post.image_sources
+        self.assertEqual([item['width'] for item in sources],
+                         list(settings.POST_IMAGE_WIDTHS))
+        webp = thumbnails.webp_supported()
+        self.assertTrue(all(bool(item['webp']) == webp for item in sources))
+        self.assertTrue(all(item['webp'].endswith('.webp')
+                            for item in sources if item['webp']))
+        response = self.guest_client.get(
+            reverse('index'),
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertContains(response, post.thumbnail_url)
+        if webp:
+            self.assertContains(response, 'type="image/webp"')
+        else:
+            self.assertNotContains(response, '<source')
+
+    def test_thumbnail_without_webp_encoder(self):
+        """Тест для проверки, что без кодека WebP миниатюры считаются
+        в исходном формате, а карточка обходится без <source>
+        """
+        post = Post.objects.create(
+            text='Без WebP', author=self.user,
+            image=SimpleUploadedFile(
+                name='plain.gif',
+                content=(b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00'
+                         b'\x00\x00\x00\x21\xf9\x04\x01\x00\x00\x00'
+                         b'\x00\x2c\x00\x00\x00\x00\x01\x00\x01\x00'
+                         b'\x00\x02\x01\x00\x00\x3b'),
+                content_type='image/gif'))
+        get_thumbnail = thumbnails.get_thumbnail
+
+        def no_webp(image, geometry, **options):
+            if options['format'] == 'WEBP':
+                raise KeyError('WEBP')
+            return get_thumbnail(image, geometry, **options)
+
+        for supported in (False, True):
+            with self.subTest(supported=supported):
+                Post.objects.filter(pk=post.pk).update(thumbnail='',
+                                                       derivatives='')
+                with mock.patch.object(thumbnails, 'webp_supported',
+                                       return_value=supported), \
+                        mock.patch.object(thumbnails, 'get_thumbnail',
+                                          no_webp), \
+                        mock.patch.object(thumbnails.logger, 'warning'):
+                    thumbnails.make_thumbnail(post.id)
+                post.refresh_from_db()
+                self.assertNotEqual(post.thumbnail, '')
+                self.assertEqual(len(post.image_sources),
+                                 len(settings.POST_IMAGE_WIDTHS))
+                self.assertTrue(all(item['webp'] is None
+                                    for item in post.image_sources))
+                response = self.guest_client.get(reverse('index'))
+                self.assertContains(response, post.thumbnail_url)
+                self.assertNotContains(response, '<source')
+
+    @override_settings(IMAGE_MAX_DIMENSION=20)
+    def test_uploaded_image_normalized(self):
+        """Тест для проверки, что картинка поворачивается по EXIF,
+        уменьшается и теряет метаданные перед сохранением
+        """
+        source = Image.new('RGB', (40, 30), 'red')
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Камера'
+        content = BytesIO()
+        source.save(content, 'JPEG', exif=exif.tobytes())
+        test_image = SimpleUploadedFile(name='photo.jpg',
+                                        content=content.getvalue(),
+                                        content_type='image/jpeg')
+        self.authorized_client.post(
+            reverse('new_post'),
+            data={'text': 'Пост с фото', 'image': test_image})
+        post = Post.objects.get(text='Пост с фото')
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (15, 20))
+            self.assertFalse(stored.getexif())
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=10)
+    def test_oversized_image_rejected(self):
+        """Тест для проверки ограничения размера загрузки"""
+        posts_count = Post.objects.count()
+        test_image = SimpleUploadedFile(name='big.gif',
+                                        content=b'GIF89a' + b'0' * 100,
+                                        content_type='image/gif')
+        response = self.authorized_client.post(
+            reverse('new_post'),
+            data={'text': 'Большой файл', 'image': test_image})
+        self.assertEqual(Post.objects.count(), posts_count)
+        self.assertContains(response, 'Файл слишком большой')
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=10)
+    def test_oversized_upload_stops_reading(self):
+        """Тест для проверки, что остаток большой загрузки не читается"""
+        request = RequestFactory().post(reverse('new_post'))
+        handler = CappedTemporaryFileUploadHandler(request)
+        handler.new_file('image', 'big.gif', 'image/gif', 100)
+        handler.receive_data_chunk(b'GIF89a', 0)
+        with self.assertRaises(StopUpload) as stop:
+            handler.receive_data_chunk(b'0' * 100, 6)
+        handler.file.close()
+        self.assertTrue(stop.exception.connection_reset)
+        self.assertTrue(request.upload_too_large)
+
     def test_authorized_can_edit_post(self):
         """Проверка, что при редактировании поста через форму
         изменяется соответствующая запись в базе данных"""
@@ -0,0 +1,82 @@
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from posts.models import Comment, FeedEntry, Group, Post
+
+User = get_user_model()
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'план запроса SQLite')
+class FeedIndexesTest(TestCase):
+    """На заполненной базе ленты читаются по индексу, без сортировки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        User.objects.bulk_create(
+            User(username=f'user{step}') for step in range(50))
+        cls.users = list(User.objects.all())
+        cls.groups = [Group.objects.create(title=f'Группа {step}',
+                                           slug=f'group-{step}')
+                      for step in range(10)]
+        Post.objects.bulk_create(
+            (Post(text=f'Пост {step}', author=cls.users[step % 50],
+                  group=cls.groups[step % 10])
+             for step in range(5000)),
+            batch_size=500,
+        )
+        cls.post = Post.objects.first()
+        FeedEntry.objects.bulk_create(
+            (FeedEntry(user=cls.users[step % 50], post=post,
+                       pub_date=post.pub_date)
+             for step, post in enumerate(Post.objects.all())),
+            batch_size=500,
+        )
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.users[step % 50],
+                    text=f'Комментарий {step}')
+            for step in range(500))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return ' '.join(str(row[-1]) for row in cursor.fetchall())
+
+    def test_feeds_use_indexes(self):
+        """Тест для проверки, что ленты не сортируются во временном
+        B-дереве, а читаются по составному индексу
+        """
+        feeds = {
+            'post_pub_date_id_idx': Post.objects.all(),
+            'post_author_pub_date_idx':
+                Post.objects.filter(author=FeedIndexesTest.users[0]),
+            'post_group_pub_date_idx':
+                Post.objects.filter(group=FeedIndexesTest.groups[0]),
+        }
+        for index, queryset in feeds.items():
+            with self.subTest(index=index):
+                page = queryset.order_by('-pub_date', '-id')[:11]
+                plan = self.query_plan(page)
+                self.assertIn(index, plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_comments_use_index(self):
+        """Тест для проверки индекса комментариев поста"""
+        comments = FeedIndexesTest.post.comments.order_by('-created', '-id')
+        plan = self.query_plan(comments[:10])
+        self.assertIn('comment_post_created_id_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_timeline_uses_index(self):
+        """Тест для проверки индекса материализованной ленты подписок"""
+        entries = (FeedEntry.objects.filter(user=FeedIndexesTest.users[0])
+                   .order_by('-pub_date', '-post_id')
+                   .values_list('pub_date', 'post_id'))
+        plan = self.query_plan(entries[:11])
+        self.assertIn('feed_user_pub_date_post_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
@@ -0,0 +1,207 @@
+import datetime as dt
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from posts import jobs
+from posts.models import Job, Post, UserStats
+from yatube import caching
+
+User = get_user_model()
+
+calls = []
+
+
+@jobs.task()
+def remember(value):
+    calls.append(value)
+
+
+@jobs.task(batch_size=10)
+def remember_batch(payloads):
+    if any(kwargs['value'] == 'плохое' for kwargs in payloads):
+        raise ValueError('плохое значение')
+    calls.append([kwargs['value'] for kwargs in payloads])
+
+
+@jobs.task(max_attempts=2)
+def explode():
+    raise ValueError('не получилось')
+
+
+@jobs.task(concurrency=1, unique=True)
+def single(value):
+    calls.append(value)
+
+
+@jobs.task(unique=True)
+def explode_once(value):
+    raise ValueError('не получилось')
+
+
+@override_settings(JOBS_EAGER=False)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.worker = jobs.Worker()
+
+    def test_delay_queues_job(self):
+        """Тест для проверки постановки задачи в очередь"""
+        remember.delay(value=1)
+        self.assertEqual(calls, [])
+        job = Job.objects.get()
+        self.assertEqual((job.name, job.kwargs, job.state),
+                         (remember.name, {'value': 1}, Job.QUEUED))
+        self.assertEqual(self.worker.run(once=True), 1)
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager(self):
+        """Тест для проверки выполнения задач сразу с JOBS_EAGER"""
+        remember.delay(value=2)
+        self.assertEqual(calls, [2])
+        self.assertFalse(Job.objects.exists())
+
+    def test_unique(self):
+        """Тест для проверки, что одинаковая задача не ставится дважды"""
+        single.delay(value=1)
+        single.delay(value=1)
+        single.delay(value=2)
+        self.assertEqual(Job.objects.count(), 2)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Job.objects.create(name=single.name, key='{"value": 1}')
+
+    def test_retry_with_queued_twin(self):
+        """Тест для проверки повтора, когда такая же задача уже в очереди"""
+        explode_once.delay(value=1)
+        task, claimed = self.worker.claim()
+        # пока первая выполняется, такую же можно поставить снова
+        explode_once.delay(value=1)
+        with self.assertLogs('yatube.jobs', 'WARNING'):
+            self.worker.process(task, claimed)
+        job = Job.objects.get()
+        self.assertEqual((job.state, job.attempts), (Job.QUEUED, 0))
+
+    def test_retry_then_fail(self):
+        """Тест для проверки повторов с паузой и отметки об ошибке"""
+        explode.delay()
+        with self.assertLogs('yatube.jobs', 'WARNING'):
+            self.worker.run(once=True)
+        job = Job.objects.get()
+        self.assertEqual((job.state, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('не получилось', job.error)
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('yatube.jobs', 'ERROR'):
+            self.worker.run(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.state, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(self.worker.run(once=True), 0)
+
+    def test_batch(self):
+        """Тест для проверки выполнения задач пачкой"""
+        remember_batch.delay_many({'value': value} for value in range(3))
+        self.worker.run(once=True)
+        self.assertEqual(calls, [[0, 1, 2]])
+
+    def test_bad_job_does_not_block_batch(self):
+        """Тест для проверки, что упавшая пачка выполняется по одной"""
+        remember_batch.delay_many({'value': value}
+                                  for value in ('а', 'плохое', 'б'))
+        with self.assertLogs('yatube.jobs', 'WARNING'):
+            self.worker.run(once=True)
+        self.assertEqual(calls, [['а'], ['б']])
+        self.assertEqual(Job.objects.get().kwargs, {'value': 'плохое'})
+
+    def test_concurrency_limit(self):
+        """Тест для проверки ограничения одновременных выполнений"""
+        single.delay(value=1)
+        Job.objects.update(state=Job.RUNNING, locked_by='другой воркер',
+                           locked_until=timezone.now()
+                           + dt.timedelta(minutes=1))
+        single.delay(value=2)
+        self.assertEqual(self.worker.run(once=True), 0)
+        self.assertEqual(calls, [])
+
+    def test_limited_claim_waits_for_lock(self):
+        """Тест для проверки, что задачу с concurrency на SQLite
+        забирает только воркер, взявший блокировку
+        """
+        single.delay(value=1)
+        key = f'jobs:claim:{single.name}'
+        self.assertTrue(caching.lock(key, 10))
+        try:
+            self.assertEqual(self.worker.run(once=True), 0)
+        finally:
+            caching.unlock(key)
+        self.assertEqual(self.worker.run(once=True), 1)
+        self.assertEqual(calls, [1])
+
+    def test_locked_database_backs_off(self):
+        """Тест для проверки, что занятая база не останавливает воркер"""
+        remember.delay(value=4)
+        claim = self.worker.claim
+        errors = [OperationalError('database is locked')]
+
+        def flaky_claim():
+            if errors:
+                raise errors.pop()
+            return claim()
+
+        with mock.patch.object(self.worker, 'claim', flaky_claim), \
+                mock.patch.object(jobs.time, 'sleep') as sleep, \
+                mock.patch.object(jobs.logger, 'warning'):
+            self.assertEqual(self.worker.run(once=True), 1)
+        sleep.assert_called_once()
+        self.assertEqual(calls, [4])
+
+    def test_stale_lock_is_reclaimed(self):
+        """Тест для проверки возврата задач упавшего воркера"""
+        remember.delay(value=3)
+        Job.objects.update(state=Job.RUNNING, locked_by='упавший воркер',
+                           attempts=1, locked_until=timezone.now()
+                           - dt.timedelta(seconds=1))
+        self.worker.run(once=True)
+        self.assertEqual(calls, [3])
+
+    def test_unknown_task_fails(self):
+        """Тест для проверки задачи, которой нет в коде"""
+        Job.objects.create(name='posts.removed_task')
+        self.worker.run(once=True)
+        self.assertEqual(Job.objects.get().state, Job.FAILED)
+
+
+@override_settings(JOBS_EAGER=False)
+class QueuedTasksTests(TestCase):
+    @override_settings(
+        EMAIL_BACKEND='posts.mail.QueuedEmailBackend',
+        JOBS_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_email_sent_by_worker(self):
+        """Тест для проверки отправки писем воркером"""
+        mail.send_mail('Тема', 'Текст', 'from@yatube.ru', ['to@yatube.ru'],
+                       html_message='<p>Текст</p>')
+        self.assertEqual(mail.outbox, [])
+        jobs.Worker().run(once=True)
+        self.assertEqual(len(mail.outbox), 1)
+        message = mail.outbox[0]
+        self.assertEqual((message.subject, message.to),
+                         ('Тема', ['to@yatube.ru']))
+        self.assertEqual(message.alternatives,
+                         [['<p>Текст</p>', 'text/html']])
+
+    def test_recount_in_background(self):
+        """Тест для проверки пересчёта счётчиков в очереди"""
+        author = User.objects.create_user(username='Author')
+        Post.objects.create(text='Пост', author=author)
+        UserStats.objects.all().delete()
+        call_command('recount_stats', '--queue', stdout=StringIO())
+        self.assertFalse(UserStats.objects.exists())
+        call_command('run_jobs', '--once', stdout=StringIO())
+        self.assertEqual(UserStats.objects.get(user=author).posts_count, 1)
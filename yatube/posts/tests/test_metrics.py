@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post
+from yatube import metrics
+
+User = get_user_model()
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Writer')
+        Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    @override_settings(METRICS_SAMPLE_RATE=1)
+    def test_sampled_request_has_server_timing(self):
+        """Тест для проверки заголовка Server-Timing у замеренного запроса"""
+        response = self.guest_client.get(reverse('index'))
+        timing = response['Server-Timing']
+        for metric in ('db;', 'tpl;', 'cache;', 'app;'):
+            self.assertIn(metric, timing)
+        self.assertNotIn('db;desc="0 queries"', timing)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_request_has_no_server_timing(self):
+        """Тест для проверки, что вне выборки замеров нет"""
+        response = self.guest_client.get(reverse('index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(METRICS_SAMPLE_RATE=1)
+    def test_metrics_endpoint(self):
+        """Тест для проверки метрик в формате Prometheus"""
+        self.guest_client.get(reverse('index'))
+        response = self.guest_client.get(reverse('metrics'))
+        body = response.content.decode()
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn('# TYPE yatube_requests_total counter', body)
+        self.assertIn('yatube_requests_total{method="GET",status="2xx",'
+                      'view="index"', body)
+        self.assertIn('yatube_request_duration_seconds_bucket{view="index",'
+                      'le="+Inf"', body)
+        self.assertIn('yatube_db_queries_total{view="index"', body)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_metrics_hidden_from_others(self):
+        """Тест для проверки, что метрики закрыты от посторонних"""
+        response = self.guest_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_metrics_hidden_behind_proxy(self):
+        """Тест для проверки, что за прокси метрики не открыты всем"""
+        response = self.guest_client.get(reverse('metrics'),
+                                         HTTP_X_FORWARDED_FOR='203.0.113.5')
+        self.assertEqual(response.status_code, 404)
+        with override_settings(RATE_LIMIT_IP_HEADER='HTTP_X_REAL_IP'):
+            response = self.guest_client.get(reverse('metrics'),
+                                             HTTP_X_REAL_IP='203.0.113.5')
+            self.assertEqual(response.status_code, 404)
+            response = self.guest_client.get(reverse('metrics'),
+                                             HTTP_X_REAL_IP='127.0.0.1')
+            self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        """Тест для проверки доступа к метрикам по токену"""
+        response = self.guest_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
+        response = self.guest_client.get(reverse('metrics'),
+                                         HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_metrics_summed_across_processes(self):
+        """Тест для проверки, что метрики воркеров складываются"""
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_DIR=directory), \
+                mock.patch.object(metrics, 'registry', metrics.Registry()):
+            # файл другого воркера за тем же портом
+            labels = [['method', 'GET'], ['status', '2xx'], ['view', 'index']]
+            with open(os.path.join(directory, '1-other.json'), 'w') as other:
+                json.dump({'counters': [['yatube_requests_total', labels, 4]],
+                           'histograms': []}, other)
+            self.guest_client.get(reverse('index'))
+            body = self.guest_client.get(reverse('metrics')).content.decode()
+            self.assertEqual(len(os.listdir(directory)), 2)
+        self.assertIn('yatube_requests_total{method="GET",status="2xx",'
+                      'view="index"} 5', body)
+        self.assertIn('yatube_request_duration_seconds_count{view="index"} 1',
+                      body)
+        self.assertNotIn('pid=', body)
@@ -1,5 +1,8 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
-from posts.models import Group, Post
+from posts.models import Comment, Follow, Group, Post, UserStats
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -33,3 +36,44 @@ class GroupModelTest(TestCase):
         for obj, expected_field in objects.items():
             with self.subTest(obj=obj):
                 self.assertEqual(str(obj), expected_field)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+
+    def test_counters_follow_writes(self):
+        """Тест для проверки, что счётчики меняются вместе с записями"""
+        follow = Follow.objects.create(user=CountersTest.reader,
+                                       author=CountersTest.author)
+        comment = Comment.objects.create(post=CountersTest.post,
+                                         author=CountersTest.reader,
+                                         text='Комментарий')
+        author_stats = UserStats.objects.get(user=CountersTest.author)
+        reader_stats = UserStats.objects.get(user=CountersTest.reader)
+        CountersTest.post.refresh_from_db()
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(reader_stats.following_count, 1)
+        self.assertEqual(CountersTest.post.comments_count, 1)
+
+        comment.delete()
+        follow.delete()
+        author_stats.refresh_from_db()
+        CountersTest.post.refresh_from_db()
+        self.assertEqual(author_stats.followers_count, 0)
+        self.assertEqual(CountersTest.post.comments_count, 0)
+
+    def test_recount_stats_command(self):
+        """Тест для проверки пересчёта счётчиков командой"""
+        UserStats.objects.all().delete()
+        Post.objects.update(comments_count=5)
+        call_command('recount_stats', stdout=StringIO())
+        self.assertEqual(
+            UserStats.objects.get(user=CountersTest.author).posts_count, 1)
+        self.assertEqual(
+            Post.objects.get(pk=CountersTest.post.pk).comments_count, 0)
@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from posts import jobs, notifications
+from posts.models import Follow, Notification, Post
+
+User = get_user_model()
+
+
+# счётчик непрочитанных сбрасывается после фиксации транзакции
+class NotificationTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='Reader')
+        self.author = User.objects.create_user(username='Author')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def publish(self, text='Пост'):
+        return Post.objects.create(text=text, author=self.author)
+
+    def unread(self):
+        return self.reader_client.get(
+            reverse('index')).context['unread_notifications']()
+
+    def test_follower_notified(self):
+        """Тест для проверки уведомления подписчика о новом посте"""
+        self.assertEqual(self.unread(), 0)
+        post = self.publish()
+        notification = Notification.objects.get()
+        self.assertEqual(
+            (notification.user, notification.post, notification.read),
+            (self.reader, post, False))
+        self.assertEqual(self.unread(), 1)
+        response = self.reader_client.get(reverse('notifications'))
+        self.assertContains(response, '<span class="badge badge-primary">1'
+                                      '</span>')
+        self.assertContains(response, reverse('post', kwargs={
+            'username': 'Author', 'post_id': post.id}))
+
+    def test_burst_coalesced(self):
+        """Тест для проверки, что серия постов даёт одно уведомление"""
+        for step in range(3):
+            last = self.publish(f'Пост {step}')
+        notification = Notification.objects.get()
+        self.assertEqual((notification.posts_count, notification.post),
+                         (3, last))
+        self.assertEqual(self.unread(), 1)
+
+    def test_unread_reset_after_commit(self):
+        """Тест для проверки, что счётчик, закэшированный до фиксации
+        уведомлений, сбрасывается
+        """
+        with override_settings(JOBS_EAGER=False):
+            post = self.publish()
+        with transaction.atomic():
+            notifications.notify(post, 1)
+            cache.set(notifications.unread_key(self.reader.pk), 0)
+        self.assertEqual(self.unread(), 1)
+
+    def test_mark_read(self):
+        """Тест для проверки отметки уведомлений прочитанными"""
+        self.publish()
+        self.reader_client.post(reverse('notifications_read'))
+        self.assertEqual(self.unread(), 0)
+        self.publish()
+        self.assertEqual(self.unread(), 1)
+        self.assertEqual(Notification.objects.count(), 2)
+        self.reader_client.post(reverse('notifications_read'))
+        self.assertEqual(list(Notification.objects.values_list(
+            'read', flat=True)), [True])
+
+    def test_mark_read_needs_post(self):
+        """Тест для проверки, что GET не отмечает уведомления"""
+        self.publish()
+        response = self.reader_client.get(reverse('notifications_read'))
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(self.unread(), 1)
+
+    @override_settings(JOBS_EAGER=False, NOTIFICATIONS_BATCH_SIZE=7)
+    def test_batched_in_queue(self):
+        """Тест для проверки уведомлений пачками в очереди задач"""
+        for number in range(20):
+            follower = User.objects.create_user(username=f'Fan{number}')
+            Follow.objects.create(user=follower,
+                                  author=self.author)
+        for step in range(3):
+            self.publish(f'Пост {step}')
+        self.assertFalse(Notification.objects.exists())
+        jobs.Worker(names=['posts.notifications.notify_followers']).run(
+            once=True)
+        self.assertEqual(Notification.objects.count(), 21)
+        self.assertEqual(set(Notification.objects.values_list(
+            'posts_count', flat=True)), {3})
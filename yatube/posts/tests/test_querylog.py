@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+from yatube import querylog
+
+User = get_user_model()
+
+
+class QueryLogTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.group = Group.objects.create(title='Жора', slug='Jora')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for step in range(5):
+            cls.post = Post.objects.create(text=f'Пост {step}',
+                                           author=cls.author, group=cls.group)
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text=f'Комментарий {step}')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(QueryLogTests.user)
+
+    def test_feed_pages_have_no_repeated_queries(self):
+        """Тест для проверки, что на страницах нет N+1 запросов"""
+        urls = [
+            reverse('index'),
+            reverse('group_posts', kwargs={'slug': 'Jora'}),
+            reverse('profile', kwargs={'username': 'Writer'}),
+            reverse('follow_index'),
+            reverse('post', kwargs={'username': 'Writer',
+                                    'post_id': QueryLogTests.post.id}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with querylog.capture() as report:
+                    self.authorized_client.get(url)
+                self.assertEqual(report.repeated, [], report.summary())
+
+    def test_repeats_point_to_template_line(self):
+        """Тест для проверки места повторяющегося запроса в шаблоне"""
+        template = Template(
+            '{% for post in posts %}{{ post.author.username }}{% endfor %}')
+        with querylog.capture() as report:
+            template.render(Context({'posts': Post.objects.all()}))
+        (sql, times, place), = report.repeated
+        self.assertEqual(times, 5)
+        self.assertIn('auth_user', sql)
+        self.assertIn(':1', place)
+        self.assertIn('posts/tests/test_querylog.py', place)
+        self.assertEqual(len(report.duplicates), 1)
+
+    @override_settings(QUERY_LOG_SAMPLE_RATE=1, SLOW_QUERY_MS=0)
+    def test_middleware_logs_slow_queries(self):
+        """Тест для проверки журнала медленных запросов"""
+        with self.assertLogs('yatube.queries', 'WARNING') as logs:
+            self.authorized_client.get(reverse('index'))
+        self.assertTrue(any('slow query' in line and 'index' in line
+                            for line in logs.output))
@@ -0,0 +1,177 @@
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Follow, Post
+from yatube import caching, ratelimit
+from yatube.metrics import registry
+
+User = get_user_model()
+
+LIMITS = {
+    'new_post': {'user': (2, 60), 'ip': (5, 60)},
+    'follow': {'user': (10, 60), 'ip': (3, 60)},
+    'signup': {'ip': (1, 600)},
+}
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_burst_then_refill(self):
+        """Тест для проверки корзины токенов: запас и пополнение"""
+        rates = [(3, 60)]
+        tats = [None]
+        for _ in range(3):
+            wait, tats = ratelimit.consume(tats, rates, 1000)
+            self.assertEqual(wait, 0)
+        wait, _ = ratelimit.consume(tats, rates, 1000)
+        self.assertEqual(wait, 20)
+        # за 20 секунд добавился один токен
+        wait, tats = ratelimit.consume(tats, rates, 1020)
+        self.assertEqual(wait, 0)
+        wait, _ = ratelimit.consume(tats, rates, 1020)
+        self.assertGreater(wait, 0)
+
+    def test_strictest_bucket_wins(self):
+        """Тест для проверки, что запрос ждёт самую пустую корзину"""
+        wait, _ = ratelimit.consume([1100, None], [(1, 60), (5, 60)], 1000)
+        self.assertEqual(wait, 100)
+
+
+@override_settings(RATE_LIMITS=LIMITS, RATE_LIMITS_ENABLED=True)
+class RateLimitViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Spammer')
+        cls.author = User.objects.create_user(username='Writer')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client(REMOTE_ADDR='10.0.0.1')
+        self.client.force_login(RateLimitViewTests.user)
+
+    def throttled_count(self, scope):
+        return registry.counters['yatube_throttled_requests_total',
+                                 (('scope', scope),)]
+
+    @override_settings(RATE_LIMITS_ENABLED=None)
+    def test_disabled_on_test_database(self):
+        """Тест для проверки, что на in-memory SQLite лимиты выключены"""
+        for text in ('Первый', 'Второй', 'Третий'):
+            response = self.client.post(reverse('new_post'), {'text': text})
+            self.assertEqual(response.status_code, 302)
+
+    def test_user_limited(self):
+        """Тест для проверки ограничения публикаций пользователя"""
+        throttled = self.throttled_count('new_post')
+        for text in ('Первый', 'Второй'):
+            response = self.client.post(reverse('new_post'), {'text': text})
+            self.assertEqual(response.status_code, 302)
+        response = self.client.post(reverse('new_post'), {'text': 'Спам'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertFalse(Post.objects.filter(text='Спам').exists())
+        self.assertEqual(self.throttled_count('new_post'), throttled + 1)
+        # форма по-прежнему открывается
+        self.assertEqual(self.client.get(reverse('new_post')).status_code,
+                         200)
+
+    def test_busy_bucket_fails_closed(self):
+        """Тест для проверки отказа, пока корзину держит другой запрос"""
+        lock = f'ratelimit:new_post:user:{RateLimitViewTests.user.pk}:lock'
+        self.assertTrue(caching.lock(lock, 10))
+        try:
+            response = self.client.post(reverse('new_post'),
+                                        {'text': 'Спам'})
+        finally:
+            caching.unlock(lock)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(Post.objects.filter(text='Спам').exists())
+
+    def test_ip_limited(self):
+        """Тест для проверки общего лимита на IP-адрес"""
+        url = reverse('profile_follow', args=['Writer'])
+        for _ in range(3):
+            self.assertEqual(self.client.get(url).status_code, 302)
+        other = Client(REMOTE_ADDR='10.0.0.1')
+        other.force_login(RateLimitViewTests.author)
+        response = other.get(reverse('profile_unfollow', args=['Spammer']))
+        self.assertEqual(response.status_code, 429)
+        neighbour = Client(REMOTE_ADDR='10.0.0.2')
+        neighbour.force_login(RateLimitViewTests.author)
+        neighbour.get(reverse('profile_follow', args=['Spammer']))
+        self.assertTrue(Follow.objects.filter(
+            user=RateLimitViewTests.author).exists())
+
+    def test_signup_limited(self):
+        """Тест для проверки ограничения регистраций с одного адреса"""
+        guest = Client(REMOTE_ADDR='10.0.0.3')
+        data = {'username': 'bot', 'password1': 'Tr1cky-pass',
+                'password2': 'Tr1cky-pass'}
+        self.assertEqual(guest.post(reverse('signup'), data).status_code,
+                         302)
+        data['username'] = 'bot2'
+        response = guest.post(reverse('signup'), data)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '600')
+        self.assertFalse(User.objects.filter(username='bot2').exists())
+
+    @override_settings(RATE_LIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_ip_from_proxy_header(self):
+        """Тест для проверки адреса клиента из заголовка прокси"""
+        url = reverse('signup')
+        data = {'username': 'bot', 'password1': 'Tr1cky-pass',
+                'password2': 'Tr1cky-pass'}
+        guest = Client(REMOTE_ADDR='10.0.0.4')
+        guest.post(url, data, HTTP_X_FORWARDED_FOR='1.1.1.1, 2.2.2.2')
+        data['username'] = 'bot2'
+        response = guest.post(url, data, HTTP_X_FORWARDED_FOR='3.3.3.3')
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(RATE_LIMITS=LIMITS, RATE_LIMITS_ENABLED=True)
+class FileCacheBucketTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Spammer')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directory.name,
+            'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 1},
+        }})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = Client(REMOTE_ADDR='10.0.0.1')
+        self.client.force_login(FileCacheBucketTests.user)
+
+    def test_bucket_survives_culling(self):
+        """Тест для проверки, что отсев файлового кэша не сбрасывает
+        корзины"""
+        for text in ('Первый', 'Второй'):
+            response = self.client.post(reverse('new_post'), {'text': text})
+            self.assertEqual(response.status_code, 302)
+        # CULL_FREQUENCY=1 очищает весь кэш при переполнении
+        for number in range(20):
+            cache.set(f'filler:{number}', number)
+        response = self.client.post(reverse('new_post'), {'text': 'Спам'})
+        self.assertEqual(response.status_code, 429)
+
+    def test_prune_keeps_recent_buckets(self):
+        """Тест для проверки удаления только полных корзин"""
+        self.client.post(reverse('new_post'), {'text': 'Пост'})
+        directory = os.path.join(caches['default']._dir, 'ratelimit')
+        self.assertEqual(len(os.listdir(directory)), 2)
+        self.assertEqual(ratelimit.prune(), 0)
+        for name in os.listdir(directory):
+            os.utime(os.path.join(directory, name), (0, 0))
+        self.assertEqual(ratelimit.prune(), 2)
+        self.assertEqual(os.listdir(directory), [])
@@ -0,0 +1,114 @@
+import datetime as dt
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from posts import http_cache
+from posts.models import Post, UserStats
+from yatube import replicas
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Primary — тестовая база, реплика — отдельный файл SQLite,
+    куда изменения сами не попадают, как при отставании репликации."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+        }
+        connections.ensure_defaults('replica')
+        connections.prepare_test_settings('replica')
+        call_command('migrate', database='replica', verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections.databases['replica']
+        delattr(connections._connections, 'replica')
+        shutil.rmtree(cls.directory)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Writer')
+        # реплика уже знает автора, но не его новый пост
+        self.author.save(using='replica')
+        UserStats.objects.get(user=self.author).save(using='replica')
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.guest_client = Client()
+        self.profile_url = reverse('profile', kwargs={'username': 'Writer'})
+
+    def tearDown(self):
+        UserStats.objects.using('replica').all().delete()
+        User.objects.using('replica').all().delete()
+
+    def test_author_sees_own_post_right_after_writing(self):
+        """Тест для проверки чтения своих записей сразу после поста"""
+        response = self.author_client.post(reverse('new_post'),
+                                           {'text': 'Свежий пост'})
+        self.assertIn(replicas.COOKIE, response.cookies)
+        self.assertTrue(Post.objects.filter(text='Свежий пост').exists())
+        for url in (self.profile_url, reverse('index')):
+            with self.subTest(url=url):
+                self.assertContains(self.author_client.get(url),
+                                    'Свежий пост')
+
+    def age_markers(self):
+        """Изменения старше окна, за которое реплики догоняют primary."""
+        old = timezone.now() - dt.timedelta(minutes=1)
+        cache.set_many({http_cache.marker_key(scope): old for scope in (
+            'index', f'profile:{self.author.id}')}, timeout=None)
+
+    def test_other_reads_go_to_replica(self):
+        """Тест для проверки, что остальные читают с реплики"""
+        self.author_client.post(reverse('new_post'),
+                                {'text': 'Свежий пост'})
+        self.age_markers()
+        response = self.guest_client.get(self.profile_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Свежий пост')
+        self.assertNotIn(replicas.COOKIE, response.cookies)
+
+    def test_pin_expires(self):
+        """Тест для проверки, что после окна автор снова читает реплику"""
+        self.author_client.post(reverse('new_post'),
+                                {'text': 'Свежий пост'})
+        self.author_client.cookies[replicas.COOKIE] = '0'
+        self.assertNotContains(self.author_client.get(self.profile_url),
+                               'Свежий пост')
+
+    def test_fresh_change_read_from_primary(self):
+        """Тест для проверки, что публичная страница со свежим
+        изменением не кэшируется с отстающей реплики
+        """
+        self.author_client.post(reverse('new_post'),
+                                {'text': 'Свежий пост'})
+        response = self.guest_client.get(self.profile_url)
+        self.assertContains(response, 'Свежий пост')
+        self.assertIn('Last-Modified', response)
+
+    def test_shared_first_page_built_on_primary(self):
+        """Тест для проверки, что общий состав главной не собирается
+        на реплике и автор видит свой пост
+        """
+        self.author_client.post(reverse('new_post'),
+                                {'text': 'Свежий пост'})
+        self.age_markers()
+        self.guest_client.get(reverse('index'))
+        self.assertContains(self.author_client.get(reverse('index')),
+                            'Свежий пост')
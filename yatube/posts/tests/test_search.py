@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post
+from posts.stemmer import stem
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_superuser(
+            username='Oleg', email='oleg@yatube.ru', password='SuperOleg')
+        cls.cats = Post.objects.create(
+            text='Гуляли с котами по набережной', author=cls.user)
+        cls.dogs = Post.objects.create(
+            text='Собака лает, караван идёт', author=cls.user)
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('search'), {'q': query, **params})
+        return response.context['page']
+
+    def test_stemmer(self):
+        """Тест для проверки основ русских слов"""
+        self.assertEqual(stem('котами'), stem('кот'))
+        self.assertEqual(stem('набережной'), stem('набережная'))
+
+    def test_search_finds_word_forms(self):
+        """Тест для проверки, что поиск находит другие формы слова"""
+        self.assertEqual(list(self.search('кот')), [SearchTests.cats])
+        self.assertEqual(list(self.search('собаки')), [SearchTests.dogs])
+
+    def test_index_follows_edit_and_delete(self):
+        """Тест для проверки, что индекс обновляется при правке
+        и удалении поста
+        """
+        post = Post.objects.get(pk=SearchTests.dogs.pk)
+        post.text = 'Кошка спит'
+        post.save()
+        self.assertEqual(list(self.search('собака')), [])
+        self.assertEqual(list(self.search('кошки')), [post])
+        post.delete()
+        self.assertEqual(list(self.search('кошка')), [])
+
+    def test_more_relevant_post_first_and_cursor(self):
+        """Тест для проверки ранжирования и курсора в выдаче"""
+        best = Post.objects.create(text='кот кот кот', author=SearchTests.user)
+        with self.settings(POSTS_PER_PAGE=1):
+            first = self.search('кот')
+            self.assertEqual(list(first), [best])
+            second = self.search('кот', cursor=first.paginator.next_cursor)
+            self.assertEqual(list(second), [SearchTests.cats])
+            self.assertFalse(second.has_next())
+            back = self.search('кот',
+                               cursor=second.paginator.previous_cursor)
+            self.assertEqual(list(back), [best])
+
+    @override_settings(POSTS_SEARCH_BACKEND='posts.search.SimpleSearchBackend')
+    def test_simple_backend(self):
+        """Тест для проверки запасного поиска без индекса"""
+        self.assertEqual(list(self.search('караван')), [SearchTests.dogs])
+
+    def test_admin_search_uses_index(self):
+        """Тест для проверки поиска постов в админке"""
+        client = Client()
+        client.force_login(SearchTests.user)
+        response = client.get('/admin/posts/post/', {'q': 'котов'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [SearchTests.cats])
@@ -0,0 +1,68 @@
+import datetime as dt
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+from posts.models import Comment, FeedEntry, Follow, Group, Post, UserStats
+from posts import feed
+from posts.seeding import Seeder
+
+User = get_user_model()
+
+
+class SeedDataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('seed_data', users=60, groups=4, posts=5, comments=2,
+                     follows=8, batch_size=50, seed=1, stdout=StringIO())
+
+    def test_counters_match_data(self):
+        """Тест для проверки, что счётчики пересчитаны после загрузки"""
+        user = (User.objects.annotate(total=Count('posts'))
+                .order_by('-total').first())
+        self.assertEqual(user.stats.posts_count, user.posts.count())
+        self.assertEqual(UserStats.objects.count(), User.objects.count())
+        post = Post.objects.order_by('-comments_count').first()
+        self.assertEqual(post.comments_count, post.comments.count())
+
+    def test_followers_are_skewed(self):
+        """Тест для проверки степенного распределения подписчиков"""
+        followers = sorted(
+            Follow.objects.values('author').annotate(total=Count('id'))
+            .values_list('total', flat=True), reverse=True)
+        self.assertGreater(followers[0], 4 * followers[len(followers) // 2])
+
+    def test_dates_are_kept(self):
+        """Тест для проверки, что даты постов и комментариев не равны
+        моменту загрузки
+        """
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 1)
+        comment = Comment.objects.select_related('post').first()
+        self.assertGreaterEqual(comment.created, comment.post.pub_date)
+
+    def test_feeds_are_built(self):
+        """Тест для проверки, что ленты собраны по подпискам"""
+        follow = Follow.objects.first()
+        self.assertEqual(
+            set(FeedEntry.objects.filter(user=follow.user)
+                .values_list('post_id', flat=True)),
+            set(feed.timeline(follow.user).values_list('id', flat=True)))
+
+    def test_caches_expired(self):
+        """Тест для проверки, что загрузка сдвигает Last-Modified
+        и сбрасывает закэшированные ленты
+        """
+        past = dt.datetime(2020, 1, 1)
+        cache.set('lastmod:index', past)
+        cache.set(feed.INDEX_CACHE_KEY, ([], False))
+        Seeder(seed=2).run(users=5, groups=1, posts=1, comments=0,
+                           follows=1)
+        self.assertGreater(cache.get('lastmod:index'), past)
+        self.assertIsNone(cache.get(feed.INDEX_CACHE_KEY))
+        group = Group.objects.order_by('id').last()
+        self.assertIsNotNone(cache.get(f'lastmod:group:{group.id}'))
@@ -3,7 +3,7 @@ from django.test import Client, TestCase
 from django.urls import reverse
 from django import forms
 import datetime as dt
-from posts.models import Group, Post, Follow
+from posts.models import Comment, Group, Post, Follow
 import shutil
 import tempfile
 from django.conf import settings
@@ -237,6 +237,33 @@ class PaginatorViewsTest(TestCase):
         response = self.client.get(reverse('index') + '?page=2')
         self.assertEqual(len(response.context.get('page').object_list), 3)
 
+    def test_cursor_pages_walk_whole_feed(self):
+        """Тест для проверки курсорного паджинатора: вперёд и назад"""
+        first = self.client.get(reverse('index')).context['page']
+        self.assertTrue(first.paginator.cursor_based)
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+        second = self.client.get(
+            reverse('index'),
+            {'cursor': first.paginator.next_cursor}).context['page']
+        self.assertEqual(len(second.object_list), 3)
+        self.assertFalse(second.has_next())
+        seen = {post.id for post in first} | {post.id for post in second}
+        self.assertEqual(seen, set(Post.objects.values_list('id', flat=True)))
+        back = self.client.get(
+            reverse('index'),
+            {'cursor': second.paginator.previous_cursor}).context['page']
+        self.assertEqual([post.id for post in back],
+                         [post.id for post in first])
+        self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Тест для проверки, что битый курсор отдаёт первую страницу"""
+        response = self.client.get(reverse('index'), {'cursor': 'xx!'})
+        page = response.context['page']
+        self.assertEqual(len(page.object_list), 10)
+        self.assertFalse(page.has_previous())
+
 
 class ViewsAdditionalTests(TestCase):
     @classmethod
@@ -282,11 +309,30 @@ class ViewsAdditionalTests(TestCase):
         self.assertNotEqual(task_text_0, 'Жора')
 
     def test_cache(self):
-        self.authorized_client.get(reverse('index'))
-        key = make_template_fragment_key('index_page')
+        cache.clear()
+        response = self.authorized_client.get(reverse('index'))
+        post = response.context['page'][0]
+        key = make_template_fragment_key('post_card',
+                                         [post.id, post.updated, True])
         result = cache.get(key)
         self.assertNotEqual(result, None)
 
+    def test_cached_card_expires_on_comment_and_group_change(self):
+        """Тест для проверки, что карточка поста перерисовывается
+        после комментария и переименования группы
+        """
+        cache.clear()
+        self.authorized_client.get(reverse('index'))
+        Comment.objects.create(post=ViewsAdditionalTests.test_post2,
+                               author=self.user, text='Комментарий')
+        response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, 'Комментариев: 1')
+        group = ViewsAdditionalTests.group2
+        group.title = 'Новое имя'
+        group.save()
+        response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, '#Новое имя')
+
 
 class FollowTests(TestCase):
     @classmethod
@@ -365,4 +411,212 @@ class FollowTests(TestCase):
         не появляется в ленте тех, кто на него не подписан
         """
         response = self.authorized_client.get(reverse('follow_index'))
-        self.assertEqual(response.context.get('page').object_list.count(), 0)
+        self.assertEqual(len(response.context.get('page').object_list), 0)
+
+
+class QueryBudgetTests(TestCase):
+    """Число запросов страницы не зависит от числа постов на ней."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.group = Group.objects.create(title='Жора', slug='Jora')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for step in range(12):
+            post = Post.objects.create(text=f'Пост {step}',
+                                       author=cls.author, group=cls.group)
+            Comment.objects.create(post=post, author=cls.user,
+                                   text=f'Комментарий {step}')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(QueryBudgetTests.user)
+
+    def test_feed_views_query_budget(self):
+        """Тест для проверки бюджета запросов страниц с лентами"""
+        post = Post.objects.first()
+        budgets = {
+            # на холодном кэше состав первой страницы и число
+            # уведомлений для меню читаются отдельно
+            reverse('index'): 5,
+            reverse('group_posts', kwargs={'slug': 'Jora'}): 6,
+            reverse('profile', kwargs={'username': 'Writer'}): 7,
+            # ключи ленты, список знаменитостей и сами посты
+            reverse('follow_index'): 6,
+            reverse('post', kwargs={'username': 'Writer',
+                                    'post_id': post.id}): 6,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertNumQueries(budget):
+                    self.authorized_client.get(url)
+
+
+class HttpCacheTests(TestCase):
+    """Заголовки кэширования и условные запросы HTML-страниц."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Writer')
+        cls.group = Group.objects.create(title='Жора', slug='Jora')
+        cls.post = Post.objects.create(text='Пост', author=cls.author,
+                                       group=cls.group)
+        cls.urls = (
+            reverse('index'),
+            reverse('group_posts', kwargs={'slug': 'Jora'}),
+            reverse('profile', kwargs={'username': 'Writer'}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_anonymous_pages_are_public(self):
+        """Тест для проверки публичного кэширования страниц для анонимов"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('max-age', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+                self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_not_modified_skips_rendering(self):
+        """Тест для проверки ответа 304 без рендеринга шаблона"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                modified = self.guest_client.get(url)['Last-Modified']
+                response = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=modified)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                self.assertFalse(response.templates)
+
+    def test_comment_changes_last_modified(self):
+        """Тест для проверки, что комментарий обновляет Last-Modified"""
+        past = dt.datetime(2020, 1, 1, tzinfo=dt.timezone.utc)
+        for scope in ('index', f'group:{self.group.id}',
+                      f'profile:{self.author.id}'):
+            cache.set(f'lastmod:{scope}', past)
+        modified = {url: self.guest_client.get(url)['Last-Modified']
+                    for url in self.urls}
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Комментарий')
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=modified[url])
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_lost_marker_does_not_go_back(self):
+        """Тест для проверки, что вытесненная из кэша отметка не даёт
+        устаревший ответ 304 после удаления поста
+        """
+        extra = Post.objects.create(text='Удалю', author=self.author,
+                                    group=self.group)
+        past = dt.datetime(2020, 1, 1)
+        Post.objects.update(updated=past)
+        scopes = ('index', f'group:{self.group.id}',
+                  f'profile:{self.author.id}')
+        for scope in scopes:
+            cache.set(f'lastmod:{scope}', past)
+        modified = {url: self.guest_client.get(url)['Last-Modified']
+                    for url in self.urls}
+        extra.delete()
+        cache.delete_many([f'lastmod:{scope}' for scope in scopes])
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=modified[url])
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_moved_post_changes_both_groups(self):
+        """Тест для проверки, что перенос поста обновляет Last-Modified
+        старой и новой группы
+        """
+        other = Group.objects.create(title='Другая', slug='other')
+        post = Post.objects.create(text='Переезд', author=self.author,
+                                   group=self.group)
+        past = dt.datetime(2020, 1, 1, tzinfo=dt.timezone.utc)
+        urls = (reverse('group_posts', kwargs={'slug': 'Jora'}),
+                reverse('group_posts', kwargs={'slug': 'other'}))
+        for scope in (f'group:{self.group.id}', f'group:{other.id}'):
+            cache.set(f'lastmod:{scope}', past)
+        modified = {url: self.guest_client.get(url)['Last-Modified']
+                    for url in urls}
+        client = Client()
+        client.force_login(self.author)
+        client.post(reverse('post_edit', kwargs={'username': 'Writer',
+                                                 'post_id': post.id}),
+                    {'text': 'Переезд', 'group': other.id})
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=modified[url])
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_authorized_pages_are_private(self):
+        """Тест для проверки, что личные страницы не попадают в CDN"""
+        client = Client()
+        client.force_login(self.author)
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertIn('private', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+                self.assertFalse(response.has_header('Last-Modified'))
+
+
+class CommentsPaginationTests(TestCase):
+    """Комментарии выводятся порциями и подгружаются фрагментами."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Writer')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        for step in range(settings.COMMENTS_PER_PAGE + 5):
+            commenter = User.objects.create_user(username=f'Reader{step}')
+            Comment.objects.create(post=cls.post, author=commenter,
+                                   text=f'Комментарий {step}')
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.post_url = reverse('post', kwargs={
+            'username': 'Writer', 'post_id': CommentsPaginationTests.post.id})
+        self.fragment_url = reverse('post_comments', kwargs={
+            'username': 'Writer', 'post_id': CommentsPaginationTests.post.id})
+
+    def test_post_page_shows_first_comments(self):
+        """Тест для проверки первой порции комментариев на странице поста"""
+        response = self.guest_client.get(self.post_url)
+        comments = response.context['comments_page']
+        self.assertEqual(len(comments), settings.COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text,
+                         f'Комментарий {settings.COMMENTS_PER_PAGE + 4}')
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, self.fragment_url)
+
+    def test_fragment_continues_from_cursor(self):
+        """Тест для проверки подгрузки следующей порции фрагментом"""
+        cursor = self.guest_client.get(
+            self.post_url).context['comments_page'].paginator.next_cursor
+        response = self.guest_client.get(self.fragment_url,
+                                         {'cursor': cursor})
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        comments = response.context['comments_page']
+        self.assertEqual([comment.text for comment in comments],
+                         [f'Комментарий {step}' for step in range(4, -1, -1)])
+        self.assertFalse(comments.has_next())
+
+    def test_fragment_query_budget(self):
+        """Тест для проверки, что авторы комментариев читаются
+        одним запросом
+        """
+        with self.assertNumQueries(2):
+            self.guest_client.get(self.fragment_url)
@@ -0,0 +1,79 @@
+import json
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+
+from . import http_cache, jobs
+from .models import Post
+
+logger = logging.getLogger('yatube.thumbnails')
+
+
+def schedule(post):
+    """Сбрасывает миниатюру поста и ставит её расчёт в очередь задач."""
+    Post.objects.filter(pk=post.pk).update(thumbnail='', derivatives='',
+                                           updated=timezone.now())
+    if post.image:
+        # и без воркера (JOBS_EAGER) расчёт идёт вне транзакции запроса
+        transaction.on_commit(lambda: make_thumbnail.delay(post_id=post.pk))
+
+
+def fallback_format(image):
+    # у PNG и GIF может быть прозрачность, которую JPEG не сохранит
+    if image.name.lower().endswith(('.jpg', '.jpeg')):
+        return 'JPEG'
+    return 'PNG'
+
+
+def webp_supported():
+    # сборка Pillow может быть без кодека WebP
+    Image.init()
+    return 'WEBP' in Image.SAVE
+
+
+def render(image, geometry, image_format):
+    """Имя миниатюры или None, если этот формат записать не удалось."""
+    try:
+        return get_thumbnail(image, geometry, format=image_format,
+                             crop='center', upscale=True).name
+    except (KeyError, OSError):
+        logger.warning('no %s thumbnail %s for %s', image_format, geometry,
+                       image.name, exc_info=True)
+        return None
+
+
+@jobs.task(concurrency=settings.THUMBNAIL_WORKERS, unique=True)
+def make_thumbnail(post_id):
+    """Считает набор размеров картинки поста в исходном формате
+    и, если Pillow умеет, в WebP."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    width, height = map(int, settings.POST_THUMBNAIL_GEOMETRY.split('x'))
+    webp = webp_supported()
+    derivatives = []
+    for size in settings.POST_IMAGE_WIDTHS:
+        geometry = f'{size}x{round(height * size / width)}'
+        fallback = render(post.image, geometry, fallback_format(post.image))
+        if fallback is None:
+            continue
+        derivatives.append({
+            'width': size,
+            'webp': render(post.image, geometry, 'WEBP') if webp else None,
+            'fallback': fallback,
+        })
+    if not derivatives:
+        return
+    # картинку могли заменить, пока считались миниатюры
+    updated = Post.objects.filter(pk=post_id, image=post.image.name).update(
+        thumbnail=derivatives[-1]['fallback'],
+        derivatives=json.dumps(derivatives),
+        updated=timezone.now(),
+    )
+    if updated:
+        # иначе браузеры и CDN получали бы 304 на страницу с заглушкой
+        http_cache.touch_post(post.author_id, post.group_id)
@@ -0,0 +1,56 @@
+import os
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import (StopUpload,
+                                             TemporaryFileUploadHandler)
+from PIL import Image, ImageOps
+
+SAVE_FORMATS = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'GIF': 'image/gif'}
+
+
+class CappedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл, но не больше IMAGE_UPLOAD_MAX_SIZE.
+
+    На превышении разбор тела прерывается без чтения остатка, а запрос
+    получает флаг ``upload_too_large``, чтобы форма отказала с понятной
+    ошибкой.
+    """
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.request.upload_too_large = True
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def normalize_image(uploaded):
+    """Поворачивает картинку по EXIF, убирает метаданные и уменьшает
+    до IMAGE_MAX_DIMENSION по большей стороне.
+
+    Анимированные картинки и форматы без перекодирования остаются как есть.
+    """
+    with Image.open(uploaded) as image:
+        if image.format not in SAVE_FORMATS or getattr(
+                image, 'is_animated', False):
+            uploaded.seek(0)
+            return uploaded
+        image_format = image.format
+        icc_profile = image.info.get('icc_profile')
+        image = ImageOps.exif_transpose(image)
+        limit = settings.IMAGE_MAX_DIMENSION
+        image.thumbnail((limit, limit), Image.LANCZOS)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        normalized = TemporaryUploadedFile(
+            os.path.basename(uploaded.name), SAVE_FORMATS[image_format],
+            0, None)
+        options = {'icc_profile': icc_profile} if icc_profile else {}
+        if image_format == 'JPEG':
+            options.update(quality=settings.IMAGE_JPEG_QUALITY,
+                           optimize=True)
+        image.save(normalized, image_format, **options)
+    normalized.size = normalized.tell()
+    normalized.seek(0)
+    return normalized
@@ -1,19 +1,27 @@
 from django.shortcuts import render, get_object_or_404
-from django.core.paginator import Paginator
 from .models import Post, Group, Follow
 from .forms import PostForm, CommentForm
+from .paginator import CursorPaginator, get_page
+from . import counters, feed, notifications, thumbnails
+from .http_cache import (cache_policy, group_scope, index_scope,
+                         profile_scope)
+from .search import SearchPaginator
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.views.decorators.http import require_POST
+from yatube import parallel
+from yatube.ratelimit import ratelimit
 
 User = get_user_model()
 
 
+@cache_policy(index_scope)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page = get_page(request, post_list, cache_key=feed.INDEX_CACHE_KEY)
     return render(
         request,
         'index.html',
@@ -21,56 +29,94 @@ def index(request):
     )
 
 
+@cache_policy(group_scope)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts = group.posts.for_feed()
+    page = get_page(request, posts,
+                    cache_key=feed.group_cache_key(group.id))
     return render(request, "group.html", {"group": group, 'page': page})
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page = None
+    if query:
+        paginator = SearchPaginator(query, settings.POSTS_PER_PAGE)
+        page = paginator.get_page(request.GET.get('cursor'))
+    return render(request, 'search.html', {'query': query, 'page': page})
+
+
 @login_required
+@ratelimit('new_post')
+@transaction.atomic
 def new_post(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None,
+                    upload_too_large=getattr(request, 'upload_too_large',
+                                             False))
     if not form.is_valid():
         return render(request, 'new.html',
                       {'form': form, 'is_edit': False})
     else:
-        post = form.save(commit=False)
-        post.author = request.user
-        post.save()
+        form.instance.author = request.user
+        post = form.save()
+        if post.image:
+            thumbnails.schedule(post)
         return redirect("index")
 
 
+@cache_policy(profile_scope)
 def profile(request, username):
     profile = get_object_or_404(User, username=username)
-    posts = profile.posts.all()
     # __import__('pdb').set_trace()
-    paginator = Paginator(posts, 10)
-    count = paginator.count
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user,
-        author=profile).exists()
+
+    def is_following():
+        return request.user.is_authenticated and Follow.objects.filter(
+            user=request.user,
+            author=profile).exists()
+
+    stats, page, following = parallel.gather(
+        lambda: counters.get_stats(profile),
+        lambda: get_page(request, profile.posts.for_feed()),
+        is_following)
     return render(request,
                   'profile.html',
-                  {'profile': profile, "page": page, "count": count,
+                  {'profile': profile, "page": page,
+                   "count": stats.posts_count, 'stats': stats,
                    'following': following})
 
 
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
+    post = get_object_or_404(Post.objects.for_feed(), id=post_id,
+                             author__username=username)
     # count = Post.objects.filter(author__username=username).count()
-    author = get_object_or_404(User, username=username)
-    count = author.posts.count()
-    comments = post.comments.all()
+    comments = post.comments.select_related('author')
+    stats, comments_page = parallel.gather(
+        lambda: counters.get_stats(post.author),
+        lambda: get_comments_page(comments, request.GET.get('cursor')))
     form = CommentForm()
     # __import__('pdb').set_trace()
     return render(request, 'post.html',
                   {'post': post, 'author': post.author,
-                   "count": count, 'form': form, 'comments': comments})
+                   "count": stats.posts_count, 'stats': stats,
+                   'form': form, 'comments': comments,
+                   'comments_page': comments_page})
+
+
+def post_comments(request, username, post_id):
+    """Следующая порция комментариев HTML-фрагментом для подгрузки."""
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             id=post_id, author__username=username)
+    comments_page = get_comments_page(
+        post.comments.select_related('author'), request.GET.get('cursor'))
+    return render(request, 'includes/comment_list.html',
+                  {'post': post, 'comments_page': comments_page})
+
+
+def get_comments_page(comments, cursor):
+    paginator = CursorPaginator(comments, settings.COMMENTS_PER_PAGE,
+                                keys=('created', 'id'))
+    return paginator.get_page(cursor)
 
 
 @login_required
@@ -79,9 +125,13 @@ def post_edit(request, username, post_id):
     if request.user != post.author:
         return redirect("post", username=username, post_id=post_id)
     form = PostForm(request.POST or None,
-                    files=request.FILES or None, instance=post)
+                    files=request.FILES or None, instance=post,
+                    upload_too_large=getattr(request, 'upload_too_large',
+                                             False))
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return redirect("post", username=username, post_id=post_id)
     return render(request, 'new.html',
                   {'form': PostForm(instance=post),
@@ -104,6 +154,8 @@ def server_error(request):
 
 
 @login_required
+@ratelimit('comment')
+@transaction.atomic
 def add_comment(request, username, post_id):
     post = get_object_or_404(Post, id=post_id, author__username=username)
     form = CommentForm(request.POST or None)
@@ -118,16 +170,29 @@ def add_comment(request, username, post_id):
         return redirect('post', username, post_id)
 
 
+@login_required
+def notification_list(request):
+    items = request.user.notifications.select_related('author', 'post')
+    return render(request, 'notifications.html',
+                  {'notifications': items[:settings.NOTIFICATIONS_PER_PAGE]})
+
+
+@login_required
+@require_POST
+def notifications_read(request):
+    notifications.mark_read(request.user)
+    return redirect('notifications')
+
+
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = feed.get_timeline_page(request, request.user)
     return render(request, 'follow.html', {'page': page})
 
 
 @login_required
+@ratelimit('follow', methods=('GET', 'POST'))
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
@@ -137,6 +202,8 @@ def profile_follow(request, username):
 
 
 @login_required
+@ratelimit('follow', methods=('GET', 'POST'))
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author and Follow.objects.get(user=request.user,
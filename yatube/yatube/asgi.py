@@ -0,0 +1,185 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``,
+for example ``uvicorn yatube.asgi:application``.
+
+Django 2.2 не умеет ASGI сам, поэтому здесь тонкий адаптер: тело
+запроса читается в цикле событий, а Django обрабатывает запрос в пуле
+из ASGI_THREADS потоков. Медленные клиенты не занимают поток, а один
+процесс обслуживает столько запросов сразу, сколько в пуле потоков.
+
+Тело больше FILE_UPLOAD_MAX_MEMORY_SIZE уходит во временный файл,
+больше ASGI_MAX_BODY_SIZE — получает 413. Ответ отправляется по мере
+того, как Django отдаёт его части.
+"""
+
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+def scope_to_environ(scope, body):
+    """WSGI environ для HTTP-запроса ASGI; ``body`` — байты или файл."""
+    if isinstance(body, bytes):
+        body = BytesIO(body)
+    length = body.seek(0, os.SEEK_END)
+    body.seek(0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # WSGI передаёт путь байтами в latin-1
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        # тело уже прочитано целиком, даже если пришло по частям
+        'CONTENT_LENGTH': str(length),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    server = scope.get('server') or ('localhost', 80)
+    environ['SERVER_NAME'], environ['SERVER_PORT'] = server[0], str(server[1])
+    client = scope.get('client')
+    if client:
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = (client[0],
+                                                          str(client[1]))
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name == 'CONTENT_LENGTH':
+            continue
+        if name != 'CONTENT_TYPE':
+            name = f'HTTP_{name}'
+        value = value.decode('latin-1')
+        if name in environ:
+            separator = '; ' if name == 'HTTP_COOKIE' else ','
+            value = environ[name] + separator + value
+        environ[name] = value
+    return environ
+
+
+class ASGIHandler:
+    def __init__(self, threads=None):
+        self.wsgi = get_wsgi_application()
+        # у каждого потока своё соединение с базой
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads or settings.ASGI_THREADS,
+            thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Неподдерживаемый тип ASGI: {scope["type"]}')
+        try:
+            body = await read_body(scope, receive,
+                                   settings.ASGI_MAX_BODY_SIZE)
+        except RequestTooLarge:
+            await send({'type': 'http.response.start', 'status': 413,
+                        'headers': [(b'content-type',
+                                     b'text/plain; charset=utf-8')]})
+            await send({'type': 'http.response.body',
+                        'body': 'Слишком большой запрос.'.encode()})
+            return
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, self.handle, scope,
+                                       body, send, loop)
+        finally:
+            body.close()
+
+    def handle(self, scope, body, send, loop):
+        def send_now(message):
+            # поток ждёт отправки: медленный клиент не копит ответ в памяти
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['response'] = {
+                'status': int(status.split(' ', 1)[0]),
+                # Set-Cookie из WSGIHandler начинается с пробела
+                'headers': [(name.lower().encode('latin-1'),
+                             value.strip().encode('latin-1'))
+                            for name, value in headers],
+            }
+
+        response = self.wsgi(scope_to_environ(scope, body), start_response)
+        try:
+            # генератор может вызвать start_response на первой части
+            for chunk in response:
+                if not chunk:
+                    continue
+                if started:
+                    send_now({'type': 'http.response.start',
+                              **started.pop('response')})
+                send_now({'type': 'http.response.body', 'body': chunk,
+                          'more_body': True})
+            if started:
+                send_now({'type': 'http.response.start',
+                          **started.pop('response')})
+            send_now({'type': 'http.response.body', 'body': b''})
+        finally:
+            # сигнал request_finished: возврат соединений с базой;
+            # в том же потоке, что обрабатывал запрос
+            if hasattr(response, 'close'):
+                response.close()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+async def read_body(scope, receive, limit):
+    """Тело запроса во временном файле или None, если клиент отключился.
+
+    Тело длиннее ``limit`` байт дальше не читается: RequestTooLarge.
+    """
+    for name, value in scope.get('headers', []):
+        if name.lower() == b'content-length' and int(value) > limit:
+            raise RequestTooLarge
+    body = SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            body.close()
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            body.close()
+            raise RequestTooLarge
+        body.write(chunk)
+        if not message.get('more_body'):
+            body.seek(0)
+            return body
+
+
+application = ASGIHandler()
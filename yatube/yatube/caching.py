@@ -0,0 +1,100 @@
+import hashlib
+import math
+import os
+import random
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+
+MISSING = object()
+
+
+def get_or_compute(key, compute, timeout, beta=1.0,
+                   lock_timeout=10, wait=2.0):
+    """Читает ключ из общего кэша и пересчитывает его одним воркером.
+
+    Значение хранится вместе со временем расчёта и сроком годности.
+    До истечения срока ключ пересчитывается заранее с вероятностью,
+    растущей к концу срока (probabilistic early expiration, XFetch),
+    а сам пересчёт закрыт блокировкой ``lock``: пока один
+    воркер ходит в базу, остальные отдают старое значение или ждут
+    нового не дольше ``wait`` секунд.
+    """
+    lock_key = f'{key}:lock'
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expiry = entry
+        early = delta * beta * math.log(1 - random.random())
+        if time.time() - early < expiry:
+            return value
+        if not lock(lock_key, lock_timeout):
+            return value
+    elif not lock(lock_key, lock_timeout):
+        value = _wait_for(key, wait)
+        if value is not MISSING:
+            return value
+        return compute()
+    try:
+        start = time.time()
+        value = compute()
+        delta = time.time() - start
+        cache.set(key, (value, delta, time.time() + timeout), timeout)
+    finally:
+        unlock(lock_key)
+    return value
+
+
+def lock(key, timeout):
+    """Берёт блокировку ``key`` в общем кэше на ``timeout`` секунд.
+
+    ``cache.add`` атомарен в Redis, Memcached и локальной памяти, но у
+    FileBasedCache в Django 2.2 это has_key и set, и два процесса могут
+    взять блокировку вместе. Там её держит файл, созданный с O_EXCL.
+    """
+    backend = caches['default']
+    if not isinstance(backend, FileBasedCache):
+        return cache.add(key, 1, timeout)
+    path = lock_path(backend, key)
+    for _ in range(3):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            # блокировка упавшего процесса истекает по времени файла
+            try:
+                if os.path.getmtime(path) + timeout > time.time():
+                    return False
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+    return False
+
+
+def unlock(key):
+    backend = caches['default']
+    if not isinstance(backend, FileBasedCache):
+        cache.delete(key)
+        return
+    try:
+        os.unlink(lock_path(backend, key))
+    except FileNotFoundError:
+        pass
+
+
+def lock_path(backend, key):
+    # отдельный каталог: cache.clear() и отсев MAX_ENTRIES его не трогают
+    name = hashlib.md5(backend.make_key(key).encode()).hexdigest()
+    return os.path.join(backend._dir, 'locks', f'{name}.lock')
+
+
+def _wait_for(key, wait, step=0.05):
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        time.sleep(step)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return MISSING
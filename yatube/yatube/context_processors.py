@@ -1,6 +1,13 @@
 import datetime as dt
 
+from posts.notifications import unread_count
+
 
 def year(request):
     year = dt.datetime.now().year
     return {'year': year}
+
+
+def notifications(request):
+    # шаблон вызовет функцию, только если выводит меню
+    return {'unread_notifications': lambda: unread_count(request.user)}
@@ -0,0 +1,14 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import AutoField
+
+
+def bulk_batch_size(model, size, using=DEFAULT_DB_ALIAS):
+    """batch_size для bulk_create в пределах лимитов базы.
+
+    Django 2.2 передаёт явный batch_size как есть, а SQLite не примет
+    больше 999 параметров и 500 строк в одном INSERT.
+    """
+    fields = [field for field in model._meta.concrete_fields
+              if not isinstance(field, AutoField)]
+    limit = connections[using].ops.bulk_batch_size(fields, [])
+    return min(size, limit) if limit else size
@@ -0,0 +1,136 @@
+import threading
+import time
+
+from django.db import OperationalError
+
+# пулы процесса по алиасу базы
+pools = {}
+pools_lock = threading.Lock()
+
+
+class Pool:
+    """Ограниченный пул открытых соединений с базой.
+
+    Соединений не больше ``size``: когда все заняты, поток ждёт
+    освободившееся не дольше ``timeout`` секунд. Соединение, простоявшее
+    без дела дольше ``check_interval``, перед выдачей проверяется
+    запросом ``ping``; отжившие ``max_lifetime`` закрываются.
+    """
+
+    def __init__(self, connect, ping, size=10, timeout=10,
+                 check_interval=30, max_lifetime=1800):
+        self.connect = connect
+        self.ping = ping
+        self.size = size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.max_lifetime = max_lifetime
+        self.condition = threading.Condition()
+        # простаивающие: (соединение, когда открыто, когда возвращено)
+        self.idle = []
+        # открытые соединения и время открытия
+        self.opened = {}
+        # открытые и открывающиеся прямо сейчас
+        self.total = 0
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self.condition:
+            while True:
+                while self.idle:
+                    raw, opened, released = self.idle.pop()
+                    if self.healthy(raw, opened, released):
+                        return raw
+                    self.discard(raw)
+                if self.total < self.size:
+                    self.total += 1
+                    break
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    raise OperationalError(
+                        f'Все {self.size} соединений пула заняты')
+                self.condition.wait(left)
+        try:
+            raw = self.connect()
+        except Exception:
+            with self.condition:
+                self.total -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.opened[id(raw)] = time.monotonic()
+        return raw
+
+    def healthy(self, raw, opened, released):
+        now = time.monotonic()
+        if now - opened > self.max_lifetime:
+            return False
+        if now - released > self.check_interval:
+            try:
+                self.ping(raw)
+            except Exception:
+                return False
+        return True
+
+    def release(self, raw, broken=False):
+        with self.condition:
+            if broken or id(raw) not in self.opened:
+                self.discard(raw)
+            else:
+                self.idle.append(
+                    (raw, self.opened[id(raw)], time.monotonic()))
+            self.condition.notify()
+
+    def discard(self, raw):
+        if self.opened.pop(id(raw), None) is not None:
+            self.total -= 1
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+
+def get_pool(alias, connect, ping, options):
+    with pools_lock:
+        if alias not in pools:
+            pools[alias] = Pool(connect, ping, **options)
+        return pools[alias]
+
+
+def ping(raw):
+    cursor = raw.cursor()
+    try:
+        cursor.execute('SELECT 1')
+    finally:
+        cursor.close()
+
+
+class PooledDatabaseWrapperMixin:
+    """Берёт соединения из Pool вместо открытия новых и возвращает их
+    туда при закрытии. Настройки пула — ключ ``POOL`` в DATABASES,
+    без него соединения открываются и закрываются как обычно."""
+
+    def open_connection(self, conn_params):
+        return super().get_new_connection(conn_params)
+
+    def get_new_connection(self, conn_params):
+        if 'POOL' not in self.settings_dict:
+            return self.open_connection(conn_params)
+        pool = get_pool(self.alias,
+                        lambda: self.open_connection(conn_params), ping,
+                        self.settings_dict['POOL'])
+        return pool.acquire()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        if 'POOL' not in self.settings_dict:
+            return super()._close()
+        broken = self.errors_occurred and not self.is_usable()
+        if not broken:
+            try:
+                # незавершённая транзакция не должна достаться другому
+                self.connection.rollback()
+            except Exception:
+                broken = True
+        pools[self.alias].release(self.connection, broken)
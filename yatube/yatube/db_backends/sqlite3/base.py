@@ -0,0 +1,12 @@
+from django.db.backends.sqlite3 import base
+
+from ..pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    def open_connection(self, conn_params):
+        connection = super().open_connection(conn_params)
+        # PRAGMA действуют на соединение, поэтому ставятся при открытии
+        for name, value in self.settings_dict.get('PRAGMAS', {}).items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
@@ -0,0 +1,365 @@
+import glob
+import hmac
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache.backends.base import BaseCache
+from django.http import Http404, HttpResponse
+from django.template.backends.django import Template
+from django.utils.module_loading import import_string
+
+from .parallel import wrap_queries
+
+# заголовки, которые ставит прокси перед приложением
+PROXY_HEADERS = ('HTTP_X_FORWARDED_FOR', 'HTTP_X_REAL_IP', 'HTTP_FORWARDED')
+
+# границы гистограммы длительности запроса, секунды
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+DESCRIPTIONS = {
+    'yatube_requests_total': (
+        'counter', 'Обработанные запросы'),
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время обработки запроса'),
+    'yatube_sampled_requests_total': (
+        'counter', 'Запросы с подробными замерами'),
+    'yatube_db_queries_total': (
+        'counter', 'Запросы к базе в замеренных запросах'),
+    'yatube_db_duration_seconds_total': (
+        'counter', 'Время запросов к базе в замеренных запросах'),
+    'yatube_template_duration_seconds_total': (
+        'counter', 'Время рендеринга шаблонов в замеренных запросах'),
+    'yatube_cache_requests_total': (
+        'counter', 'Чтения из кэша в замеренных запросах'),
+    'yatube_throttled_requests_total': (
+        'counter', 'Запросы, отклонённые ограничением частоты'),
+}
+
+
+class Registry:
+    """Счётчики и гистограммы в текстовом формате Prometheus.
+
+    Каждый процесс копит значения в памяти и не чаще раза в
+    METRICS_FLUSH_INTERVAL секунд сохраняет их в свой файл в METRICS_DIR.
+    /metrics/ складывает файлы всех процессов, и завершившихся тоже:
+    воркеры за одним портом отдают одни и те же суммы, а перезапуск
+    воркера не уменьшает счётчики. Каталог очищают при выкладке, как
+    multiprocess-каталог prometheus_client. Без METRICS_DIR отдаются
+    значения одного процесса.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        # pid переиспользуется, а файл прежнего процесса нужно сохранить
+        self.name = f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json'
+        self.flushed = time.monotonic()
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.counters[name, tuple(sorted(labels.items()))] += value
+        self.flush_due()
+
+    def observe(self, name, labels, value):
+        key = name, tuple(sorted(labels.items()))
+        with self.lock:
+            buckets = self.histograms.setdefault(key,
+                                                 [0] * (len(BUCKETS) + 2))
+            buckets[bisect_left(BUCKETS, value)] += 1
+            buckets[-1] += value
+        self.flush_due()
+
+    def flush_due(self):
+        if (time.monotonic() - self.flushed
+                >= settings.METRICS_FLUSH_INTERVAL):
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value
+                             in self.counters.items()],
+                'histograms': [[name, labels, list(buckets)]
+                               for (name, labels), buckets
+                               in self.histograms.items()],
+            }
+
+    def flush(self):
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        with self.flush_lock:
+            self.flushed = time.monotonic()
+            data = self.snapshot()
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, self.name)
+            # /metrics/ других воркеров не увидит файл наполовину
+            with open(f'{path}.tmp', 'w') as target:
+                json.dump(data, target)
+            os.replace(f'{path}.tmp', path)
+
+    def collect(self):
+        """Счётчики и гистограммы, сложенные по всем процессам."""
+        directory = settings.METRICS_DIR
+        if not directory:
+            return self.snapshot()
+        self.flush()
+        merged = {'counters': defaultdict(float), 'histograms': {}}
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            try:
+                with open(path) as source:
+                    data = json.load(source)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in data['counters']:
+                key = name, tuple(map(tuple, labels))
+                merged['counters'][key] += value
+            for name, labels, buckets in data['histograms']:
+                key = name, tuple(map(tuple, labels))
+                total = merged['histograms'].setdefault(
+                    key, [0] * len(buckets))
+                for index, value in enumerate(buckets):
+                    total[index] += value
+        return {kind: [[name, labels, value] for (name, labels), value
+                       in values.items()]
+                for kind, values in merged.items()}
+
+    def render(self):
+        data = self.collect()
+        rows = defaultdict(list)
+        for name, labels, value in data['counters']:
+            rows[name].append(f'{name}{format_labels(labels)} {value:g}')
+        for name, labels, buckets in data['histograms']:
+            total = 0
+            for bound, hits in zip(BUCKETS + ('+Inf',), buckets):
+                total += hits
+                rows[name].append(
+                    f'{name}_bucket'
+                    f'{format_labels(labels + (("le", str(bound)),))}'
+                    f' {total}')
+            rows[name].append(f'{name}_sum{format_labels(labels)} '
+                              f'{buckets[-1]:g}')
+            rows[name].append(f'{name}_count{format_labels(labels)} '
+                              f'{total}')
+        lines = []
+        for name, (kind, text) in DESCRIPTIONS.items():
+            if name in rows:
+                lines += [f'# HELP {name} {text}', f'# TYPE {name} {kind}']
+                lines += sorted(rows[name])
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    pairs = ((key, str(value).replace('\\', '\\\\').replace('"', '\\"')
+              .replace('\n', '\\n'))
+             for key, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}'
+
+
+registry = Registry()
+# значения родителя остаются в его файле, дочерний процесс (воркер
+# gunicorn с --preload) начинает свой
+os.register_at_fork(after_in_child=registry.reset)
+
+# замеры текущего запроса, если он попал в выборку
+current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        # запросы из потоков gather считаются параллельно
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def server_timing(self, duration):
+        return ', '.join([
+            f'db;desc="{self.queries} queries";dur={self.db_time * 1000:.1f}',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hit, {self.cache_misses} miss"',
+            f'app;dur={duration * 1000:.1f}',
+        ])
+
+
+def time_query(execute, sql, params, many, context):
+    stats = current.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if stats is not None:
+            with stats.lock:
+                stats.queries += 1
+                stats.db_time += time.perf_counter() - started
+
+
+def instrument_templates():
+    render = Template.render
+    if getattr(render, 'instrumented', False):
+        return
+
+    def timed_render(self, *args, **kwargs):
+        stats = current.get()
+        if stats is None:
+            return render(self, *args, **kwargs)
+        # вложенные render_to_string не считаются дважды
+        stats.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += time.perf_counter() - started
+
+    timed_render.instrumented = True
+    Template.render = timed_render
+
+
+MISSING = object()
+
+
+def instrument_caches():
+    for options in settings.CACHES.values():
+        backend = import_string(options['BACKEND'])
+        if getattr(backend.get, 'instrumented', False):
+            continue
+        backend.get = counted_get(backend.get)
+        # базовый get_many сам вызывает get, его чтения уже посчитаны
+        if backend.get_many is not BaseCache.get_many:
+            backend.get_many = counted_get_many(backend.get_many)
+
+
+def counted_get(get):
+    def wrapper(self, key, default=None, *args, **kwargs):
+        value = get(self, key, MISSING, *args, **kwargs)
+        stats = current.get()
+        if stats is not None:
+            with stats.lock:
+                if value is MISSING:
+                    stats.cache_misses += 1
+                else:
+                    stats.cache_hits += 1
+        return default if value is MISSING else value
+
+    wrapper.instrumented = True
+    return wrapper
+
+
+def counted_get_many(get_many):
+    def wrapper(self, keys, *args, **kwargs):
+        keys = list(keys)
+        found = get_many(self, keys, *args, **kwargs)
+        stats = current.get()
+        if stats is not None:
+            with stats.lock:
+                stats.cache_hits += len(found)
+                stats.cache_misses += len(keys) - len(found)
+        return found
+
+    return wrapper
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+class MetricsMiddleware:
+    """Время каждого запроса по представлениям и подробные замеры
+    для выборки запросов.
+
+    Длительность и число запросов считаются всегда: это пара вызовов
+    perf_counter. Доля METRICS_SAMPLE_RATE запросов дополнительно
+    замеряет запросы к базе, рендеринг шаблонов и чтения кэша и отдаёт
+    их в заголовке Server-Timing.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument_templates()
+        instrument_caches()
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        stats = None
+        if random.random() < settings.METRICS_SAMPLE_RATE:
+            stats = RequestStats()
+            token = current.set(stats)
+            try:
+                with wrap_queries(time_query):
+                    response = self.get_response(request)
+            finally:
+                current.reset(token)
+        else:
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        self.record(request, response, duration, stats)
+        if stats is not None:
+            response['Server-Timing'] = stats.server_timing(duration)
+        return response
+
+    def record(self, request, response, duration, stats):
+        labels = {'view': view_name(request)}
+        registry.inc('yatube_requests_total', {
+            **labels, 'method': request.method,
+            'status': f'{response.status_code // 100}xx'})
+        registry.observe('yatube_request_duration_seconds', labels, duration)
+        if stats is None:
+            return
+        registry.inc('yatube_sampled_requests_total', labels)
+        registry.inc('yatube_db_queries_total', labels, stats.queries)
+        registry.inc('yatube_db_duration_seconds_total', labels,
+                     stats.db_time)
+        registry.inc('yatube_template_duration_seconds_total', labels,
+                     stats.template_time)
+        registry.inc('yatube_cache_requests_total',
+                     {**labels, 'result': 'hit'}, stats.cache_hits)
+        registry.inc('yatube_cache_requests_total',
+                     {**labels, 'result': 'miss'}, stats.cache_misses)
+
+
+def metrics_allowed(request):
+    """С METRICS_TOKEN нужен заголовок Authorization: Bearer <токен>,
+    без него — адрес клиента из METRICS_ALLOWED_IPS.
+
+    Адрес берётся как у ограничений частоты: за своим прокси
+    REMOTE_ADDR у всех клиентов один, поэтому без RATE_LIMIT_IP_HEADER
+    проксированный запрос не пускается.
+    """
+    # ratelimit сам импортирует этот модуль
+    from .ratelimit import client_ip
+
+    if settings.METRICS_TOKEN:
+        return hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            f'Bearer {settings.METRICS_TOKEN}')
+    if not settings.RATE_LIMIT_IP_HEADER and any(
+            header in request.META for header in PROXY_HEADERS):
+        return False
+    return client_ip(request) in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    """Метрики процесса для Prometheus, только для metrics_allowed."""
+    if not metrics_allowed(request):
+        raise Http404
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
@@ -0,0 +1,82 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.VIEW_QUERY_THREADS - 1),
+    thread_name_prefix='queries')
+
+# execute-wrapper'ы текущего запроса: соединения потоков пула свои,
+# поэтому gather ставит им те же обёртки на время вызова
+query_wrappers = contextvars.ContextVar('query_wrappers', default=())
+
+
+@contextmanager
+def wrap_queries(wrapper):
+    """Ставит execute-wrapper соединениям текущего потока, а через
+    gather — и соединениям потоков пула."""
+    token = query_wrappers.set(query_wrappers.get() + (wrapper,))
+    try:
+        with install(wrapper):
+            yield
+    finally:
+        query_wrappers.reset(token)
+
+
+@contextmanager
+def install(*wrappers):
+    with ExitStack() as stack:
+        for wrapper in wrappers:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+def runs_concurrently():
+    if settings.VIEW_QUERY_THREADS < 2:
+        return False
+    for connection in connections.all():
+        # поток запроса держит соединение пула, пока потоки gather ждут
+        # свои: под нагрузкой все соединения пула у запросов, и потоки
+        # gather не дожидаются ни одного
+        if 'POOL' in connection.settings_dict:
+            return False
+        # открытая транзакция не видна другим потокам, а in-memory
+        # SQLite тестов блокирует таблицы между потоками
+        if connection.in_atomic_block or (
+                connection.vendor == 'sqlite'
+                and connection.is_in_memory_db()):
+            return False
+    return True
+
+
+def gather(*calls):
+    """Выполняет независимые вызовы одновременно и возвращает их
+    результаты по порядку.
+
+    Первый вызов идёт в текущем потоке, остальные — в общем пуле
+    VIEW_QUERY_THREADS - 1 потоков со своими соединениями, так что
+    ожидание базы и кэша складывается не в сумму, а в максимум. С пулом
+    соединений (DB_POOL_SIZE) вызовы идут по очереди.
+    Контекст запроса (реплика, замеры) копируется в поток, а обёртки
+    из wrap_queries ставятся соединениям потока.
+    """
+    if not runs_concurrently():
+        return [call() for call in calls]
+    first, *rest = calls
+    futures = [executor.submit(contextvars.copy_context().run,
+                               run_in_worker, call) for call in rest]
+    result = first()
+    return [result] + [future.result() for future in futures]
+
+
+def run_in_worker(call):
+    close_old_connections()
+    try:
+        with install(*query_wrappers.get()):
+            return call()
+    finally:
+        close_old_connections()
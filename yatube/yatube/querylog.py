@@ -0,0 +1,143 @@
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.template.base import Node
+
+from .metrics import view_name
+from .parallel import wrap_queries
+
+logger = logging.getLogger('yatube.queries')
+
+THIS_FILE = os.path.abspath(__file__)
+
+
+def origin():
+    """Откуда пришёл запрос: строка шаблона и строка кода проекта.
+
+    Обход стека дорогой, поэтому вызывается только для медленных
+    и повторяющихся запросов.
+    """
+    template = code = None
+    frame = sys._getframe(1)
+    while frame and not (template and code):
+        if (template is None
+                and frame.f_code is Node.render_annotated.__code__):
+            node = frame.f_locals['self']
+            token = getattr(node, 'token', None)
+            if token is not None and node.origin is not None:
+                template = f'{node.origin.template_name}:{token.lineno}'
+        filename = frame.f_code.co_filename
+        if (code is None and filename.startswith(settings.BASE_DIR)
+                and filename != THIS_FILE
+                and 'site-packages' not in filename):
+            relative = os.path.relpath(filename, settings.BASE_DIR)
+            code = f'{relative}:{frame.f_lineno}'
+        frame = frame.f_back
+    return ', '.join(place for place in (template, code) if place) or '?'
+
+
+class QueryReport:
+    """Execute-wrapper, собирающий запросы одного HTTP-запроса или блока.
+
+    Запросы дольше SLOW_QUERY_MS сразу пишутся в лог с местом вызова.
+    Одинаковый SQL, выполненный QUERY_REPEAT_THRESHOLD раз и больше,
+    считается повтором: с теми же параметрами — дубликат, с разными —
+    признак N+1 в цикле.
+    """
+
+    def __init__(self, request=None):
+        self.request = request
+        self.slow_ms = settings.SLOW_QUERY_MS
+        self.threshold = settings.QUERY_REPEAT_THRESHOLD
+        self.count = 0
+        self.duration = 0.0
+        self.slow = []
+        self.exact = Counter()
+        self.shapes = Counter()
+        self.origins = {}
+        self.lock = threading.Lock()
+
+    @property
+    def view(self):
+        return view_name(self.request) if self.request else '-'
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            # запросы из потоков gather пишутся в тот же отчёт
+            with self.lock:
+                self.record(sql, params, duration)
+
+    def record(self, sql, params, duration):
+        self.count += 1
+        self.duration += duration
+        self.exact[sql, repr(params)] += 1
+        self.shapes[sql] += 1
+        if self.shapes[sql] == self.threshold:
+            self.origins[sql] = origin()
+        if duration * 1000 >= self.slow_ms:
+            place = origin()
+            self.slow.append((sql, duration, place))
+            logger.warning('slow query %.1f ms in %s at %s: %s',
+                           duration * 1000, self.view, place, sql)
+
+    @property
+    def duplicates(self):
+        """[(sql, раз)] для запросов, повторённых с теми же параметрами."""
+        return [(sql, times) for (sql, _), times in self.exact.items()
+                if times >= self.threshold]
+
+    @property
+    def repeated(self):
+        """[(sql, раз, место)] для SQL, повторённого с любыми параметрами."""
+        return [(sql, times, self.origins[sql])
+                for sql, times in self.shapes.most_common()
+                if times >= self.threshold]
+
+    def summary(self):
+        lines = [f'{self.view}: {self.count} queries, '
+                 f'{self.duration * 1000:.1f} ms, '
+                 f'{len(self.slow)} slow, '
+                 f'{len(self.duplicates)} duplicated']
+        for sql, times, place in self.repeated:
+            lines.append(f'  {times}x at {place}: {sql}')
+        return '\n'.join(lines)
+
+    def log(self):
+        level = (logging.WARNING if self.slow or self.repeated
+                 else logging.DEBUG)
+        logger.log(level, self.summary())
+
+
+@contextmanager
+def capture(request=None):
+    """Собирает QueryReport по всем базам внутри блока, например в тестах."""
+    report = QueryReport(request)
+    with wrap_queries(report):
+        yield report
+
+
+class QueryLogMiddleware:
+    """Журнал медленных и повторяющихся запросов для доли
+    QUERY_LOG_SAMPLE_RATE HTTP-запросов."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.QUERY_LOG_SAMPLE_RATE:
+            return self.get_response(request)
+        with capture(request) as report:
+            response = self.get_response(request)
+        report.log()
+        return response
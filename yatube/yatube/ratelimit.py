@@ -0,0 +1,224 @@
+import hashlib
+import math
+import os
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import connection
+from django.http import HttpResponse
+
+from . import caching
+from .metrics import registry
+
+# корзины всех ключей проверяются и списываются одним вызовом в Redis
+REDIS_SCRIPT = """
+local now = tonumber(ARGV[1])
+local wait = 0
+local tats = {}
+for i, key in ipairs(KEYS) do
+    local interval = tonumber(ARGV[2 * i])
+    local period = tonumber(ARGV[2 * i + 1])
+    local tat = math.max(tonumber(redis.call('GET', key) or 0), now)
+    tats[i] = tat + interval
+    wait = math.max(wait, tats[i] - period - now)
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    redis.call('SET', key, tostring(tats[i]),
+               'PX', math.ceil((tats[i] - now) * 1000))
+end
+return '0'
+"""
+
+_redis_script = None
+
+
+def consume(tats, rates, now):
+    """Списывает по токену из корзин.
+
+    Корзина на ``limit`` запросов за ``period`` секунд хранится одним
+    числом — временем, когда она снова будет полной (GCRA). ``tats`` —
+    эти времена или None для новых корзин, ``rates`` — пары
+    (limit, period). Возвращает (секунды до следующей попытки, новые
+    времена); если ждать не нужно, первое значение 0.
+    """
+    wait = 0
+    new_tats = []
+    for tat, (limit, period) in zip(tats, rates):
+        new_tat = max(tat or 0, now) + period / limit
+        new_tats.append(new_tat)
+        wait = max(wait, new_tat - period - now)
+    return wait, new_tats
+
+
+def client_ip(request):
+    if settings.RATE_LIMIT_IP_HEADER:
+        forwarded = request.META.get(settings.RATE_LIMIT_IP_HEADER, '')
+        if forwarded:
+            # ближайший к нашему прокси адрес добавлен им самим
+            return forwarded.split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def buckets(request, scope):
+    """Ключи кэша и лимиты корзин запроса."""
+    limits = settings.RATE_LIMITS.get(scope, {})
+    identities = {'ip': client_ip(request)}
+    if request.user.is_authenticated:
+        identities['user'] = request.user.pk
+    return [(f'ratelimit:{scope}:{kind}:{identities[kind]}', rate)
+            for kind, rate in sorted(limits.items()) if kind in identities]
+
+
+def enabled():
+    if settings.RATE_LIMITS_ENABLED is not None:
+        return settings.RATE_LIMITS_ENABLED
+    return not (connection.vendor == 'sqlite'
+                and connection.is_in_memory_db())
+
+
+def check(request, scope):
+    """Секунды до следующей разрешённой попытки или 0."""
+    keys_rates = buckets(request, scope) if enabled() else []
+    if not keys_rates:
+        return 0
+    keys, rates = zip(*keys_rates)
+    if settings.CACHES['default']['BACKEND'] == (
+            'django_redis.cache.RedisCache'):
+        return check_redis(keys, rates)
+    return check_cache(keys, rates)
+
+
+def check_redis(keys, rates):
+    global _redis_script
+    if _redis_script is None:
+        from django_redis import get_redis_connection
+        _redis_script = get_redis_connection('default').register_script(
+            REDIS_SCRIPT)
+    args = [repr(time.time())]
+    for limit, period in rates:
+        args += [repr(period / limit), repr(period)]
+    return float(_redis_script(keys=[cache.make_key(key) for key in keys],
+                               args=args))
+
+
+def check_cache(keys, rates, lock_timeout=1, wait=0.1, step=0.01):
+    # без Redis чтение и запись корзин закрыты блокировками
+    # yatube.caching.lock; кто не дождался блокировки, получает отказ:
+    # под всплеском запросов ограничитель не должен открываться
+    locked = []
+    deadline = time.time() + wait
+    try:
+        for key in keys:
+            while not caching.lock(f'{key}:lock', lock_timeout):
+                if time.time() > deadline:
+                    return wait
+                time.sleep(step)
+            locked.append(f'{key}:lock')
+        now = time.time()
+        retry_after, tats = consume(load(keys), rates, now)
+        if retry_after > 0:
+            return retry_after
+        save(keys, tats, now)
+        return 0
+    finally:
+        for key in locked:
+            caching.unlock(key)
+
+
+def load(keys):
+    backend = caches['default']
+    if not isinstance(backend, FileBasedCache):
+        stored = cache.get_many(keys)
+        return [stored.get(key) for key in keys]
+    tats = []
+    for key in keys:
+        try:
+            with open(bucket_path(backend, key)) as source:
+                tats.append(float(source.read()))
+        except (FileNotFoundError, ValueError):
+            tats.append(None)
+    return tats
+
+
+def save(keys, tats, now):
+    backend = caches['default']
+    if not isinstance(backend, FileBasedCache):
+        for key, tat in zip(keys, tats):
+            cache.set(key, tat, math.ceil(tat - now))
+        return
+    for key, tat in zip(keys, tats):
+        path = bucket_path(backend, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f'{path}.tmp', 'w') as target:
+            target.write(repr(tat))
+        os.replace(f'{path}.tmp', path)
+
+
+def bucket_path(backend, key):
+    # у FileBasedCache каждая запись перебирает каталог кэша (_cull), а
+    # при MAX_ENTRIES выбрасывает случайную треть ключей вместе с
+    # корзинами. Корзины лежат рядом, как блокировки yatube.caching:
+    # чтение и запись — один файл, отсев их не трогает
+    name = hashlib.md5(backend.make_key(key).encode()).hexdigest()
+    return os.path.join(backend._dir, 'ratelimit', name)
+
+
+def prune():
+    """Удаляет с диска корзины, которые уже снова полны.
+
+    Нужно только FileBasedCache: там корзины не истекают сами.
+    Возвращает число удалённых файлов.
+    """
+    backend = caches['default']
+    if not isinstance(backend, FileBasedCache):
+        return 0
+    # корзина полна не позже чем через период после последней записи
+    longest = max((period for limits in settings.RATE_LIMITS.values()
+                   for _, period in limits.values()), default=0)
+    try:
+        entries = list(os.scandir(os.path.join(backend._dir, 'ratelimit')))
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime + longest < time.time():
+                os.unlink(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def throttled(scope, retry_after):
+    registry.inc('yatube_throttled_requests_total', {'scope': scope})
+    response = HttpResponse('Слишком много запросов, попробуйте позже.',
+                            content_type='text/plain; charset=utf-8',
+                            status=429)
+    response['Retry-After'] = str(math.ceil(retry_after))
+    return response
+
+
+def ratelimit(scope, methods=('POST',)):
+    """Ограничивает частоту запросов к представлению.
+
+    Лимиты ``settings.RATE_LIMITS[scope]`` считаются отдельно для
+    пользователя и для IP-адреса корзинами токенов в общем кэше, без
+    запросов к базе. Превысившему лимит отвечает 429 с Retry-After.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                retry_after = check(request, scope)
+                if retry_after > 0:
+                    return throttled(scope, retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
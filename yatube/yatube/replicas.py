@@ -0,0 +1,80 @@
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+COOKIE = 'primary_until'
+
+# состояние текущего HTTP-запроса; вне запросов всё читается с primary
+current = ContextVar('replica_state', default=None)
+
+
+class RequestState:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def pin():
+    """Оставшиеся чтения текущего запроса идут на primary."""
+    state = current.get()
+    if state is not None:
+        state.pinned = True
+
+
+class ReplicaRouter:
+    """Чтения внутри HTTP-запроса идут на реплики из DATABASE_REPLICAS,
+    записи — на primary.
+
+    На primary остаются чтения сессий, чтения внутри открытой
+    транзакции, чтения после записи в этом же запросе и все запросы
+    клиента, недавно что-то записавшего (см. ReplicaPinMiddleware),
+    чтобы автор сразу видел свой пост.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = current.get()
+        if (state is None or state.pinned or state.wrote
+                or not settings.DATABASE_REPLICAS
+                or model._meta.app_label == 'sessions'
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = current.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # на репликах те же данные, что и на primary
+        return True
+
+
+class ReplicaPinMiddleware:
+    """После записи ставит cookie, и ещё REPLICA_STICKY_SECONDS запросы
+    этого клиента читают с primary, пока реплики догоняют."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            pinned = float(request.COOKIES.get(COOKIE, 0)) > time.time()
+        except ValueError:
+            pinned = False
+        state = RequestState(pinned)
+        token = current.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        if state.wrote:
+            sticky = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(COOKIE, str(int(time.time() + sticky)),
+                                max_age=sticky, httponly=True,
+                                samesite='Lax')
+        return response
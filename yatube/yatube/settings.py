@@ -1,5 +1,7 @@
 import os
 
+from yatube import database
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -37,6 +39,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.MetricsMiddleware',
+    'yatube.querylog.QueryLogMiddleware',
+    'yatube.replicas.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,6 +65,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'yatube.context_processors.year',
+                'yatube.context_processors.notifications',
             ],
         },
     },
@@ -71,12 +77,15 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# база из DATABASE_URL, постоянные соединения и пул — см. yatube/database.py
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': database.from_env(os.environ, BASE_DIR),
+    **database.replicas_from_env(os.environ, BASE_DIR),
 }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['yatube.replicas.ReplicaRouter']
+# сколько секунд после записи клиент читает с primary
+REPLICA_STICKY_SECONDS = 10
 
 
 # Password validation
@@ -121,8 +130,10 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 LOGIN_URL = "/auth/login/"
 LOGIN_REDIRECT_URL = "index"
 # LOGOUT_REDIRECT_URL = "index"
-# подключаем движок filebased.EmailBackend
-EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+# письма ставятся в очередь задач, а воркер отправляет их
+# движком filebased.EmailBackend
+EMAIL_BACKEND = "posts.mail.QueuedEmailBackend"
+JOBS_EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
@@ -132,8 +143,156 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# загрузки пишутся во временные файлы, картинки постов нормализуются
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.CappedTemporaryFileUploadHandler',
+]
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_DIMENSION = 2048
+IMAGE_JPEG_QUALITY = 85
+
+POSTS_PER_PAGE = 10
+
+# сколько комментариев показывается и подгружается за раз
+COMMENTS_PER_PAGE = 20
+
+# уведомления о новых постах: подписчики обрабатываются пачками,
+# число непрочитанных для меню хранится в кэше
+NOTIFICATIONS_BATCH_SIZE = 5000
+NOTIFICATIONS_CACHE_TIMEOUT = 24 * 60 * 60
+NOTIFICATIONS_PER_PAGE = 50
+
+# лента подписок: авторы с таким числом подписчиков читаются на лету,
+# а не раскладываются по лентам при публикации
+FEED_FANOUT_LIMIT = 1000
+FEED_MAX_LENGTH = 800
+FEED_BATCH_SIZE = 1000
+
+# общий для всех воркеров кэш: файлы на диске по умолчанию,
+# Redis при заданном REDIS_URL (нужен пакет django-redis)
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
     }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR',
+                                       os.path.join(BASE_DIR, 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# тесты получают свой кэш в памяти (yatube/test_runner.py)
+TEST_RUNNER = 'yatube.test_runner.TestRunner'
+
+# ограничения частоты записи (yatube/ratelimit.py): сколько запросов
+# за сколько секунд разрешено пользователю и одному IP-адресу. С Redis
+# корзины истекают сами; с файловым кэшем они лежат в его каталоге
+# ratelimit/ мимо MAX_ENTRIES, и полные корзины удаляет
+# manage.py prune_ratelimits по расписанию. Сайту на нескольких машинах
+# нужен Redis: файловый кэш у каждой свой
+RATE_LIMITS = {
+    'new_post': {'user': (10, 60), 'ip': (60, 60)},
+    'comment': {'user': (20, 60), 'ip': (120, 60)},
+    'follow': {'user': (60, 60), 'ip': (300, 60)},
+    'signup': {'ip': (5, 600)},
 }
+# None — лимиты действуют везде, кроме in-memory SQLite тестов: корзины
+# в общем кэше переживают тестовую базу, а id пользователей повторяются
+RATE_LIMITS_ENABLED = {'1': True, '0': False}.get(
+    os.environ.get('RATE_LIMITS_ENABLED'))
+# заголовок с адресом клиента от своего прокси, например HTTP_X_REAL_IP
+RATE_LIMIT_IP_HEADER = os.environ.get('RATE_LIMIT_IP_HEADER')
+
+# миниатюры карточек постов считаются в очереди задач,
+# не больше THUMBNAIL_WORKERS воркеров сразу
+POST_THUMBNAIL_GEOMETRY = '960x339'
+# ширины набора для srcset по возрастанию, последняя — основная
+POST_IMAGE_WIDTHS = (480, 960)
+THUMBNAIL_WORKERS = 2
+
+# поиск по постам: None — FTS5 на SQLite, LIKE на остальных базах
+POSTS_SEARCH_BACKEND = None
+POSTS_SEARCH_ADMIN_LIMIT = 1000
+
+# сколько последних комментариев отдаёт JSON API поста
+API_COMMENTS_LIMIT = 50
+
+# сколько секунд живёт состав первой страницы главной и групп
+FEED_CACHE_TIMEOUT = 20
+
+# доля запросов с подробными замерами и заголовком Server-Timing
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 0.05))
+# с каких адресов Prometheus может читать /metrics/; за прокси адрес
+# клиента берётся из RATE_LIMIT_IP_HEADER
+METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS',
+                                     '127.0.0.1').split(',')
+# если задан, /metrics/ открывается только с Authorization: Bearer <токен>
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# общий каталог, через который воркеры складывают свои метрики; один на
+# все процессы сайта, очищается перед запуском. Пустая строка — каждый
+# процесс отдаёт только свои значения
+METRICS_DIR = os.environ.get('METRICS_DIR',
+                             os.path.join(BASE_DIR, 'metrics'))
+# как часто процесс сохраняет свои метрики в METRICS_DIR, секунды
+METRICS_FLUSH_INTERVAL = 5
+
+# доля запросов, чьи SQL-запросы проверяются на медленные и повторы
+QUERY_LOG_SAMPLE_RATE = float(os.environ.get('QUERY_LOG_SAMPLE_RATE', 0))
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+# сколько одинаковых SQL за запрос считать повтором (N+1)
+QUERY_REPEAT_THRESHOLD = 3
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'yatube.queries': {
+            'handlers': ['console'],
+            'level': os.environ.get('QUERY_LOG_LEVEL', 'WARNING'),
+        },
+        'yatube.jobs': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+        },
+    },
+}
+
+# базовые замеры для manage.py benchmark
+BENCHMARK_BASELINE = os.path.join(BASE_DIR, 'benchmark_baseline.json')
+
+# сколько секунд CDN и браузер хранят ленты, открытые анонимами
+HTML_CACHE_MAX_AGE = 20
+
+# потоки ASGI-воркера (yatube/asgi.py), у каждого своё соединение с базой
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 16))
+# тело запроса длиннее получает 413: картинка поста и поля формы
+# (DATA_UPLOAD_MAX_MEMORY_SIZE по умолчанию)
+ASGI_MAX_BODY_SIZE = IMAGE_UPLOAD_MAX_SIZE + 2621440
+# сколько независимых запросов представление делает одновременно;
+# 1 — по очереди. Процессу нужно до (потоков сервера + VIEW_QUERY_THREADS
+# - 1) соединений с базой. С DB_POOL_SIZE запросы идут по очереди,
+# и пулу хватает размера не меньше числа потоков сервера в процессе
+VIEW_QUERY_THREADS = int(os.environ.get('VIEW_QUERY_THREADS', 3))
+
+# очередь фоновых задач в базе (posts/jobs.py), воркер — manage.py run_jobs;
+# JOBS_EAGER=1 выполняет задачи сразу в запросе, без воркера, по умолчанию
+# так только на in-memory SQLite тестов
+JOBS_EAGER = {'1': True, '0': False}.get(os.environ.get('JOBS_EAGER'))
+JOBS_POLL_INTERVAL = 1
+JOBS_MAX_ATTEMPTS = 5
+# пауза перед повтором, секунды; удваивается с каждой попыткой
+JOBS_RETRY_DELAY = 10
+JOBS_MAX_RETRY_DELAY = 3600
+# через сколько секунд задачи упавшего воркера снова в очереди
+JOBS_TIMEOUT = 300
+# на SQLite задачи с concurrency забираются под блокировкой в общем кэше
+JOBS_CLAIM_LOCK_TIMEOUT = 10
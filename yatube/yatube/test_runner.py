@@ -0,0 +1,27 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# тесты сбрасывают кэш, а общий файловый или Redis-кэш переживает
+# тестовую базу и нужен запущенному сайту; то же с каталогом метрик
+TEST_SETTINGS = {
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    },
+    'METRICS_DIR': None,
+}
+
+
+class TestRunner(DiscoverRunner):
+    """Запускает тесты со своим кэшем в памяти процесса и метриками
+    без общего каталога."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.caches_override = override_settings(**TEST_SETTINGS)
+        self.caches_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches_override.disable()
+        super().teardown_test_environment(**kwargs)
@@ -4,12 +4,16 @@ from django.conf.urls import handler404, handler500
 from django.conf import settings
 from django.conf.urls.static import static
 
+from . import metrics
+
 handler404 = "posts.views.page_not_found"  # noqa
 handler500 = "posts.views.server_error"  # noqa
 
 urlpatterns = [
     # импорт правил из приложения posts
     path("admin/", admin.site.urls),
+    path("api/v1/", include("posts.api_urls")),
+    path("metrics/", metrics.metrics_view, name="metrics"),
     path("", include("posts.urls")),
     # импорт правил из приложения admin
     path("auth/", include("users.urls")),